@@ -0,0 +1,80 @@
+import hashlib
+import os
+import pathlib
+from functools import lru_cache
+from logging import info
+from typing import Optional
+
+import pandas as pd
+
+from pandora import partitions
+
+# bump when the layout of the cached frames changes in a way the code hash does not capture
+CACHE_FORMAT_VERSION = 1
+CACHE_SUFFIX = '.parquet'
+
+
+def key(location: str, expansion_window: pd.DatetimeIndex, *options) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_FORMAT_VERSION}|{code_version()}|{content_hash(location)}".encode())
+    digest.update(f"|{expansion_window[0].date()}|{expansion_window[-1].date()}".encode())
+    for option in options:
+        digest.update(f"|{option}".encode())
+    return digest.hexdigest()
+
+
+def get(cache_location: str, module_location: str, cache_key: str) -> Optional[pd.DataFrame]:
+    path = resolve_path(cache_location, module_location, cache_key)
+    if not path.exists():
+        return None
+    info(f"{module_location} - reading from cache {path}")
+    return pd.read_parquet(path)
+
+
+def put(cache_location: str, module_location: str, cache_key: str, df: pd.DataFrame) -> None:
+    path = resolve_path(cache_location, module_location, cache_key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first, so concurrent readers never see a partially written frame
+    path_tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    df.to_parquet(path_tmp, index=False)
+    os.replace(path_tmp, path)
+
+
+def clear(cache_location: str) -> None:
+    for path in pathlib.Path(cache_location).glob(f"*{CACHE_SUFFIX}"):
+        path.unlink()
+
+
+def resolve_path(cache_location: str, module_location: str, cache_key: str) -> pathlib.Path:
+    return pathlib.Path(cache_location) / f"{pathlib.Path(module_location).stem}-{cache_key}{CACHE_SUFFIX}"
+
+
+def content_hash(location: str) -> str:
+    if partitions.is_partitioned(location):
+        # a partitioned location is hashed by the hashes of its partitions, so only changed partitions are re-read
+        digest = hashlib.sha256()
+        for path in partitions.list_partitions(location):
+            digest.update(f"{path.name}:{content_hash(str(path))}|".encode())
+        return digest.hexdigest()
+    stat = os.stat(location)
+    return _content_hash(location, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=128)
+def _content_hash(location: str, modified: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(location, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    # any change to the pandora sources, including the module definitions in pandora/data, invalidates the cached frames
+    root = pathlib.Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in sorted(root.glob('**/*.py')):
+        digest.update(f"{path.relative_to(root)}|".encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
@@ -1,4 +1,5 @@
-from calendar import monthrange, isleap
+import numpy as np
+import pandas as pd
 
 GEO_CODE = 'geo_code'
 COUNTRY_NAME = 'country_name'
@@ -17,18 +18,43 @@ DAY_OF_YEAR = 'day_of_year'
 
 MISSING_INDICATOR_SUFFIX = '--'
 
+# the fields identifying a country, or a geo within a country
+COUNTRY_KEYS = [GEO_CODE, COUNTRY_NAME, COUNTRY_CODE, COUNTRY_CODE3, COUNTRY_CODE_NUMERIC]
 
-def scale_week_of_year(row):
-    return row[DATE].isocalendar()[1] / 53
+# geo keys repeat across every expanded row, so modules store them as categoricals
+GEO_SCHEMA = {
+    GEO_CODE: 'category',
+    COUNTRY_NAME: 'category',
+    COUNTRY_CODE: 'category',
+    COUNTRY_CODE3: 'category',
+    REGION_NAME: 'category'
+}
 
 
-def scale_day_of_month(row):
-    date = row[DATE]
-    days_in_month = monthrange(date.year, date.month)
-    return date.day / days_in_month
+# scaled calendar fields lie in the range 0.0 -> 1.0, ready for cyclical encoding
+SCALED_SUFFIX = '_scaled'
 
 
-def scale_day_of_year(row):
-    date = row[DATE]
-    days_in_year = 366 if isleap(date.year) else 365
-    return float(date.timetuple().tm_yday) / float(days_in_year)
+def scale_week_of_year(dates: pd.Series) -> pd.Series:
+    return dates.dt.isocalendar().week.astype('float64') / 53
+
+
+def scale_day_of_month(dates: pd.Series) -> pd.Series:
+    return dates.dt.day / dates.dt.days_in_month
+
+
+def scale_day_of_year(dates: pd.Series) -> pd.Series:
+    return dates.dt.dayofyear / np.where(dates.dt.is_leap_year, 366, 365)
+
+
+def scale_day_of_week(dates: pd.Series) -> pd.Series:
+    # monday is 1/7 and sunday is 1.0, matching the day_of_week field running from 1 to 7
+    return (dates.dt.dayofweek + 1) / 7
+
+
+def scaled_calendar(dates: pd.Series) -> pd.DataFrame:
+    dates = pd.to_datetime(pd.Series(dates))
+    return pd.DataFrame({f"{WEEK}{SCALED_SUFFIX}": scale_week_of_year(dates),
+                         f"{DAY_OF_MONTH}{SCALED_SUFFIX}": scale_day_of_month(dates),
+                         f"{DAY_OF_YEAR}{SCALED_SUFFIX}": scale_day_of_year(dates),
+                         f"{DAY_OF_WEEK}{SCALED_SUFFIX}": scale_day_of_week(dates)}, index=dates.index)
@@ -19,10 +19,12 @@ class Module:
     def __init__(self,
                  location: str,
                  imputations: dict = None,
-                 mark_missing: [str] = None):
+                 mark_missing: [str] = None,
+                 schema: dict = None):
         self._location = location
         self._imputations = imputations if imputations else dict()
         self._marking_missing = mark_missing if mark_missing else set()
+        self._schema = schema if schema else dict()
 
     @property
     def imputations(self) -> Dict[str, List[Imputation]]:
@@ -35,3 +37,7 @@ class Module:
     @property
     def mark_missing(self) -> Set[str]:
         return self._marking_missing
+
+    @property
+    def schema(self) -> Dict[str, str]:
+        return self._schema
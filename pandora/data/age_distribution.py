@@ -1,6 +1,6 @@
 import pathlib
 
-from pandora.core_fields import YEAR, COUNTRY_NAME
+from pandora.core_fields import YEAR, COUNTRY_NAME, GEO_SCHEMA
 from pandora.core_types import Module, Imputation
 from pandora.imputers import impute_with_mean
 
@@ -24,4 +24,13 @@ module = Module(
         AGE_DISTRIBUTION_3: AGE_DISTRIBUTION_IMPUTATION_STRATEGY,
         AGE_DISTRIBUTION_4: AGE_DISTRIBUTION_IMPUTATION_STRATEGY,
         AGE_DISTRIBUTION_5: AGE_DISTRIBUTION_IMPUTATION_STRATEGY
+    },
+    schema={
+        **GEO_SCHEMA,
+        YEAR: 'int16',
+        AGE_DISTRIBUTION_1: 'float32',
+        AGE_DISTRIBUTION_2: 'float32',
+        AGE_DISTRIBUTION_3: 'float32',
+        AGE_DISTRIBUTION_4: 'float32',
+        AGE_DISTRIBUTION_5: 'float32'
     })
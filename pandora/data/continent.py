@@ -1,7 +1,9 @@
 import pathlib
 
+from pandora.core_fields import GEO_SCHEMA
 from pandora.core_types import Module
 
 CONTINENT = 'continent'
 
-module = Module(f"{pathlib.Path(__file__).parent.absolute()}/continent.csv")
+module = Module(f"{pathlib.Path(__file__).parent.absolute()}/continent.csv",
+                schema={**GEO_SCHEMA, CONTINENT: 'category'})
@@ -1,5 +1,7 @@
 import pathlib
 
+from pandora.core_fields import GEO_SCHEMA, COUNTRY_CODE_NUMERIC
 from pandora.core_types import Module
 
-module = Module(f"{pathlib.Path(__file__).parent.absolute()}/country_code.csv")
+module = Module(f"{pathlib.Path(__file__).parent.absolute()}/country_code.csv",
+                schema={**GEO_SCHEMA, COUNTRY_CODE_NUMERIC: 'int16'})
@@ -1,5 +1,6 @@
 import pathlib
 
+from pandora.core_fields import GEO_SCHEMA
 from pandora.core_types import Module
 
-module = Module(f"{pathlib.Path(__file__).parent.absolute()}/geo.csv")
+module = Module(f"{pathlib.Path(__file__).parent.absolute()}/geo.csv", schema=GEO_SCHEMA)
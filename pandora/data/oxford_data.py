@@ -1,6 +1,6 @@
 import pathlib
 
-from pandora.core_fields import REGION_NAME, COUNTRY_NAME
+from pandora.core_fields import REGION_NAME, COUNTRY_NAME, GEO_SCHEMA
 from pandora.core_types import Module, Imputation
 from pandora.imputers import impute_with_forward_fill, impute_with_zero
 
@@ -29,7 +29,8 @@ NPI_IMPUTATION_STRATEGY = [
     Imputation(impute_with_zero, [])
 ]
 
-FILE = "oxford_data.csv"
+# a directory of monthly partitions, appended to by oxford_data_update
+FILE = "oxford_data"
 LOCATION = f"{pathlib.Path(__file__).parent.absolute()}/{FILE}"
 
 module = Module(
@@ -50,4 +51,10 @@ module = Module(
         H3: NPI_IMPUTATION_STRATEGY,
         H6: NPI_IMPUTATION_STRATEGY,
     },
-    mark_missing=[CONFIRMED_CASES])
+    mark_missing=[CONFIRMED_CASES],
+    schema={
+        **GEO_SCHEMA,
+        CONFIRMED_CASES: 'Int32',
+        CONFIRMED_DEATHS: 'Int32',
+        **{name: 'Int8' for name in [C1, C2, C3, C4, C5, C6, C7, C8, H1, H2, H3, H6]}
+    })
@@ -2,11 +2,11 @@ import os
 import pathlib
 import re
 import urllib.request
-from datetime import datetime
 from logging import info
 
 import pandas as pd
 
+from pandora import partitions
 from pandora.core_fields import COUNTRY_NAME, REGION_NAME, DATE
 from pandora.data.oxford_data import LOCATION, FILE, CONFIRMED_CASES, \
     C1, C2, C3, C4, C5, C6, C7, C8, H1, H2, H3, H6, CONFIRMED_DEATHS
@@ -17,20 +17,79 @@ ACCEPTED_COLUMNS = [COUNTRY_NAME, REGION_NAME, DATE,
                     CONFIRMED_CASES, CONFIRMED_DEATHS,
                     C1, C2, C3, C4, C5, C6, C7, C8,
                     H1, H2, H3, H6]
+GEO_KEYS = [COUNTRY_NAME, REGION_NAME]
+NPI_COLUMNS = [C1, C2, C3, C4, C5, C6, C7, C8, H1, H2, H3, H6]
+# measures are stored as nullable integers, so the partitions hold 1 instead of 1.0
+MEASURE_SCHEMA = {name: 'Int64' for name in [CONFIRMED_CASES, CONFIRMED_DEATHS] + NPI_COLUMNS}
+# the last stored row of each geo, with its forward filled npi values. it seeds the forward fill of the next update
+TAIL_FILE = 'tail.csv'
 
 
 def update():
+    # rebuilds the store from the full data set
     info('download oxford data set')
     urllib.request.urlretrieve(EXTERNAL_LOCATION, LOCATION_FOR_PREPROCESSING)
-    df = pd.read_csv(LOCATION_FOR_PREPROCESSING,
-                     parse_dates=['Date'],
-                     date_parser=lambda value: datetime.strptime(value, "%Y%m%d").date(),
-                     keep_default_na=False)
+    partitions.clear(LOCATION)
+    resolve_tail_path(LOCATION).unlink(missing_ok=True)
+    update_incremental(LOCATION_FOR_PREPROCESSING, LOCATION)
+    os.remove(LOCATION_FOR_PREPROCESSING)
+
+
+def update_incremental(source: str = EXTERNAL_LOCATION, location: str = LOCATION) -> int:
+    # appends the (geo, date) rows of the source that are newer than the last stored date of their geo. only the
+    # tails of the affected geos are forward filled, so the cost grows with the new data instead of the full history
+    info(f"reading oxford data set from {source}")
+    df = read_source(source)
+    df_tail = read_tail(location)
+    df = df.merge(df_tail[GEO_KEYS + [DATE]].rename(columns={DATE: 'last_date'}), on=GEO_KEYS, how='left')
+    df = df[df['last_date'].isna() | (df[DATE] > df['last_date'])].drop(columns='last_date')
+    if df.empty:
+        info('oxford data set is up to date')
+        return 0
+    df = forward_fill(df, df_tail)
+    info(f"writing {len(df.index)} rows to {location}")
+    partitions.append(df, location)
+    write_tail(pd.concat([df_tail, df]), location)
+    return len(df.index)
+
+
+def read_source(source: str) -> pd.DataFrame:
+    df = pd.read_csv(source, keep_default_na=False, na_values='', dtype={'RegionName': str}, low_memory=False)
     df.columns = map(rename_column, df.columns)
     df = df.drop([column for column in df if column not in ACCEPTED_COLUMNS], axis=1)
-    info(f"writing to {LOCATION}")
-    df.to_csv(LOCATION, index=False)
-    os.remove(LOCATION_FOR_PREPROCESSING)
+    df[DATE] = pd.to_datetime(df[DATE].astype(str), format='%Y%m%d')
+    return normalize(df)
+
+
+def forward_fill(df: pd.DataFrame, df_tail: pd.DataFrame) -> pd.DataFrame:
+    # the stored tail rows are prepended to the new rows of their geo, so the fill continues from the stored values
+    df_tail = df_tail.merge(df[GEO_KEYS].drop_duplicates(), on=GEO_KEYS)
+    df = pd.concat([df_tail.assign(tail=True), df.assign(tail=False)], ignore_index=True)
+    df = df.sort_values(GEO_KEYS + [DATE], kind='mergesort', ignore_index=True)
+    df[NPI_COLUMNS] = df.groupby(GEO_KEYS, sort=False)[NPI_COLUMNS].ffill()
+    return df[~df['tail']].drop(columns='tail')
+
+
+def read_tail(location: str) -> pd.DataFrame:
+    path = resolve_tail_path(location)
+    if not path.exists():
+        return normalize(pd.DataFrame(columns=ACCEPTED_COLUMNS).astype({DATE: 'datetime64[ns]'}))
+    return normalize(pd.read_csv(path, keep_default_na=False, na_values='', dtype={REGION_NAME: str},
+                                 parse_dates=[DATE]))
+
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    df[REGION_NAME] = df[REGION_NAME].fillna('')
+    return df.astype({name: dtype for name, dtype in MEASURE_SCHEMA.items() if name in df.columns})
+
+
+def write_tail(df: pd.DataFrame, location: str) -> None:
+    df = df.sort_values(DATE, kind='mergesort').drop_duplicates(GEO_KEYS, keep='last')
+    df.to_csv(resolve_tail_path(location), index=False)
+
+
+def resolve_tail_path(location: str) -> pathlib.Path:
+    return pathlib.Path(location) / TAIL_FILE
 
 
 def rename_column(name: str) -> str:
@@ -41,4 +100,5 @@ def rename_column(name: str) -> str:
     return name
 
 
-update()
+if __name__ == '__main__':
+    update()
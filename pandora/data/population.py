@@ -1,6 +1,6 @@
 import pathlib
 
-from pandora.core_fields import REGION_NAME, YEAR, COUNTRY_NAME
+from pandora.core_fields import REGION_NAME, YEAR, COUNTRY_NAME, GEO_SCHEMA
 from pandora.core_types import Module, Imputation
 from pandora.imputers import impute_with_mean, impute_with_max
 
@@ -55,4 +55,14 @@ module = Module(
                   POPULATION_PERCENT_URBAN,
                   GDP_PER_CAPITA,
                   OBESITY_RATE,
-                  PNEUMONIA_DEATHS_PER_100K])
+                  PNEUMONIA_DEATHS_PER_100K],
+    schema={
+        **GEO_SCHEMA,
+        YEAR: 'int16',
+        POPULATION: 'float64',  # exceeds the integer precision of float32
+        POPULATION_DENSITY: 'float32',
+        POPULATION_PERCENT_URBAN: 'float32',
+        GDP_PER_CAPITA: 'float32',
+        OBESITY_RATE: 'float32',
+        PNEUMONIA_DEATHS_PER_100K: 'float32'
+    })
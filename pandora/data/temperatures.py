@@ -1,6 +1,6 @@
 import pathlib
 
-from pandora.core_fields import REGION_NAME, QUARTER, YEAR, COUNTRY_NAME
+from pandora.core_fields import REGION_NAME, QUARTER, YEAR, COUNTRY_NAME, GEO_SCHEMA
 from pandora.core_types import Module, Imputation
 from pandora.imputers import impute_with_mean
 
@@ -24,4 +24,9 @@ module = Module(
     {
         TEMPERATURE: IMPUTATION_STRATEGY,
         SPECIFIC_HUMIDITY: IMPUTATION_STRATEGY
+    },
+    schema={
+        **GEO_SCHEMA,
+        TEMPERATURE: 'float32',
+        SPECIFIC_HUMIDITY: 'float32'
     })
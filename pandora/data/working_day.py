@@ -1,13 +1,13 @@
 import pathlib
 
-from pandora.core_fields import DAY_OF_WEEK, DATE, DAY_OF_YEAR
+from pandora.core_fields import DAY_OF_WEEK, DATE, DAY_OF_YEAR, GEO_SCHEMA
 from pandora.core_types import Module, Imputation
 from pandora.imputers import impute_with_median
 
 WORKING_DAY = 'working_day'
 
 module = Module(
-    location=f"{pathlib.Path(__file__).parent.absolute()}/working_day.csv",
+    location=f"{pathlib.Path(__file__).parent.absolute()}/working_day",  # monthly partitions
     imputations={
         WORKING_DAY: [
             Imputation(impute_with_median, [DATE]),
@@ -15,4 +15,8 @@ module = Module(
             Imputation(impute_with_median, [DAY_OF_WEEK]),
         ]
     },
-    mark_missing=[WORKING_DAY])
+    mark_missing=[WORKING_DAY],
+    schema={
+        **GEO_SCHEMA,
+        WORKING_DAY: 'float32'  # imputed with medians, which can fall between 0 and 1
+    })
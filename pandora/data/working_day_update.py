@@ -1,43 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from logging import info, basicConfig, INFO
+from typing import Optional, Iterable
+
+import numpy as np
 import pandas as pd
 import datetime
+from pandora import partitions
 from pandora.data import country_code, working_day
 from pandora.data.working_day import WORKING_DAY
 from pandora.core_fields import DATE, COUNTRY_CODE
+from workalendar.core import Calendar
 from workalendar.registry import registry
 
 basicConfig(level=INFO, format='%(asctime)s\t%(levelname)s\t%(filename)s\t%(message)s')
 
 
-def update(start_date, end_date):
-    info(f"updating working days information for {start_date} to {end_date}")
-
-    # get the unique list of countries
-    df = pd.DataFrame({COUNTRY_CODE: pd.read_csv(country_code.module.location)[COUNTRY_CODE].unique()})
-
-    # generate the series of dates for the time range,
-    # then explode the dataset so there is one row per date per country
-    datetime_index = pd.date_range(start_date, end_date, freq='D')
-    df[DATE] = df.applymap(lambda r: datetime_index)
-    df = df.explode(DATE, ignore_index=True).reset_index(0, drop=True)
+def update(start_date: datetime.date,
+           end_date: datetime.date,
+           location: str = working_day.module.location,
+           workers: Optional[int] = None,
+           force: bool = False,
+           months: Optional[Iterable[str]] = None) -> None:
+    # each month is stored as one partition, so the range is extended to whole months, and only the months missing
+    # from the partitions are computed. extending the range to a new year keeps the stored years as they are.
+    # stored months are recomputed, for instance after a holiday correction of the calendars, with force for every
+    # month of the range, or with months for the given months, such as '2020-12'
+    stored = {path.stem for path in partitions.list_partitions(location)}
+    selected = {str(month) for month in pd.period_range(start_date, end_date, freq='M')}
+    selected = {month for month in selected if force or month not in stored}
+    selected.update(str(pd.Period(month, freq='M')) for month in (months if months is not None else []))
+    months = sorted(pd.Period(month, freq='M') for month in selected)
+    if not months:
+        info(f"working days information is up to date for {start_date} to {end_date}")
+        return
+    info(f"updating working days information for {len(months)} months from {months[0]} to {months[-1]}")
+    dates = pd.date_range(months[0].start_time, months[-1].end_time.normalize(), freq='D')
+    dates = dates[dates.to_period('M').isin(months)]
 
-    # calculate the working dates per country
-    df = df.groupby(COUNTRY_CODE).apply(update_for_country_code).reset_index(drop=True)
-    df[WORKING_DAY] = df[WORKING_DAY].map(lambda v: 1 if v else 0 if not v else None)
+    # get the unique list of countries, and compute their working days in parallel
+    country_codes = pd.read_csv(country_code.module.location)[COUNTRY_CODE].dropna().unique()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        df = pd.concat(executor.map(update_for_country_code, country_codes, repeat(dates)), ignore_index=True)
 
-    # persist the CSV
-    info(f"writing to {working_day.module.location}")
-    df.to_csv(working_day.module.location, index=False)
+    # persist the partitions, replacing the recomputed ones
+    info(f"writing to {location}")
+    partitions.replace(df, location)
 
 
-def update_for_country_code(group: pd.DataFrame):
-    working_registry = registry.get(group.name)
+def update_for_country_code(code: str, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    df = pd.DataFrame({COUNTRY_CODE: code, DATE: dates})
+    working_registry = registry.get(code)
     if working_registry is None:
-        info(f"no calendar found for {group.name}")
-    else:
-        working_registry = working_registry()
-        group[WORKING_DAY] = group[DATE].apply(working_registry.is_working_day)
-    return group
+        info(f"no calendar found for {code}")
+        # countries without a calendar have always been stored as working every day
+        df[WORKING_DAY] = 1
+        return df
+    working_registry = working_registry()
+    # the holidays are computed once per year, and the working days flagged with a weekday mask
+    holidays = pd.DatetimeIndex([holiday for year in dates.year.unique()
+                                 for holiday in working_registry.holidays_set(year)])
+    working = ~dates.weekday.isin(working_registry.get_weekend_days()) & ~dates.isin(holidays)
+    if type(working_registry).is_working_day is not Calendar.is_working_day:
+        # some calendars declare extra working days, which are checked against the calendar itself
+        for position in np.flatnonzero(~working):
+            working[position] = working_registry.is_working_day(dates[position].date())
+    df[WORKING_DAY] = working.astype('int8')
+    return df
 
 
-update(datetime.date(2019, 1, 1), datetime.date(2021, 12, 31))
+if __name__ == '__main__':
+    update(datetime.date(2019, 1, 1), datetime.date(2021, 12, 31))
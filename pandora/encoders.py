@@ -1,10 +1,12 @@
-import math
 from abc import ABC, abstractmethod
 from typing import Optional
 
 import category_encoders as ce
 import fnvhash
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.base import BaseEstimator, TransformerMixin
 
 
 class Encoder(ABC):
@@ -26,25 +28,77 @@ class Encoder(ABC):
 
 class CEEncoder(Encoder, ABC):
 
-    def __init__(self, name: str, infix: str, internal_encoder, minimum: float, maximum: Optional[float]):
+    def __init__(self,
+                 name: str,
+                 infix: str,
+                 internal_encoder,
+                 minimum: float,
+                 maximum: Optional[float],
+                 sparse: bool = False):
         super().__init__(name)
         self._infix = infix
         self._internal_encoder = internal_encoder
         self._minimum = minimum
         self._maximum = maximum
+        self._sparse = sparse
+        self._categories = None
+        self._lookup = None
+        self._columns = None
+
+    @property
+    def sparse(self) -> bool:
+        return self._sparse
+
+    @property
+    def columns(self) -> [str]:
+        return self._columns
+
+    def fit(self, df: pd.DataFrame) -> 'CEEncoder':
+        # the internal encoder is fit on the distinct values only, in order of appearance, which yields the same
+        # mapping as fitting on every row. the encoded vectors of the distinct values are kept as a lookup table
+        categories = df[self.name].drop_duplicates()
+        self._internal_encoder.fit(categories)
+        self._categories = pd.Index(categories)
+        self._lookup = self.encode(categories)
+        self._columns = list(self.update_column_names(self._lookup.iloc[:0]).columns)
+        self._lookup = self._lookup.to_numpy()
+        return self
 
     def fit_transform(self,
                       df: pd.DataFrame) -> pd.DataFrame:
-        df_encoded = self._internal_encoder.fit_transform(df[self.name])
-        df_encoded = df_encoded.drop(columns=['intercept'], errors='ignore')
-        df_encoded = self.update_column_names(df_encoded)
-        return df.join(df_encoded)
+        return self.fit(df).transform(df)
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_encoded = self._internal_encoder.transform(df[self.name])
-        df_encoded = df_encoded.drop(columns=['intercept'], errors='ignore')
-        df_encoded = self.update_column_names(df_encoded)
-        return df.join(df_encoded)
+        return pd.concat([df, self.transform_columns(df)], axis=1)
+
+    def transform_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        # sparse encoders return pandas sparse columns, which only store the non-zero values
+        matrix = self.transform_matrix(df)
+        if self._sparse:
+            return pd.DataFrame.sparse.from_spmatrix(matrix, index=df.index, columns=self._columns)
+        return pd.DataFrame(matrix, index=df.index, columns=self._columns)
+
+    def transform_matrix(self, df: pd.DataFrame):
+        # missing values, None as well as NaN, are coded as -1 by factorize, selecting the NaN vector appended last
+        codes, categories = pd.factorize(df[self.name])
+        vectors = self.lookup(pd.Series(list(categories) + [np.nan], dtype=object, name=self.name))
+        if self._sparse:
+            return csr_matrix(vectors)[codes]
+        return vectors.take(codes, axis=0)
+
+    def lookup(self, categories: pd.Series) -> np.ndarray:
+        positions = self._categories.get_indexer(categories)
+        unknown = positions < 0
+        if not unknown.any():
+            return self._lookup.take(positions, axis=0)
+        vectors = np.empty((len(categories.index), self._lookup.shape[1]), dtype=self._lookup.dtype)
+        vectors[~unknown] = self._lookup.take(positions[~unknown], axis=0)
+        vectors[unknown] = self.encode(categories[unknown]).to_numpy()
+        return vectors
+
+    def encode(self, categories: pd.Series) -> pd.DataFrame:
+        df_encoded = self._internal_encoder.transform(categories)
+        return df_encoded.drop(columns=['intercept'], errors='ignore')
 
     def update_column_names(self, df_encoded: pd.DataFrame) -> pd.DataFrame:
         col = 'col_'
@@ -56,43 +110,43 @@ class CEEncoder(Encoder, ABC):
 
 
 class BinaryEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_bin_', ce.BinaryEncoder(cols=[name]), 0, 1)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_bin_', ce.BinaryEncoder(cols=[name]), 0, 1, sparse)
 
 
 class SumEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_sum_', ce.SumEncoder(cols=[name]), -1.0, 1.0)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_sum_', ce.SumEncoder(cols=[name]), -1.0, 1.0, sparse)
 
 
 class HelmertContrastEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_helmert_', ce.HelmertEncoder(cols=[name]), -1.0, None)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_helmert_', ce.HelmertEncoder(cols=[name]), -1.0, None, sparse)
 
 
 class HashEncoder(CEEncoder):
-    def __init__(self, name: str, bits: int):
-        super().__init__(name, '_hash_', ce.HashingEncoder(cols=[name], n_components=bits), 0, 1)
+    def __init__(self, name: str, bits: int, sparse: bool = False):
+        super().__init__(name, '_hash_', ce.HashingEncoder(cols=[name], n_components=bits), 0, 1, sparse)
 
 
 class OneHotEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_ohe_', ce.OneHotEncoder(cols=[name], use_cat_names=True), 0, 1)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_ohe_', ce.OneHotEncoder(cols=[name], use_cat_names=True), 0, 1, sparse)
 
 
 class BackwardDifferenceEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_bde_', ce.BackwardDifferenceEncoder(cols=[name]), -1.0, 1.0)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_bde_', ce.BackwardDifferenceEncoder(cols=[name]), -1.0, 1.0, sparse)
 
 
 class BaseNEncoder(CEEncoder):
-    def __init__(self, name: str, base: int = 8):
-        super().__init__(name, '_base_n_', ce.BaseNEncoder(cols=[name]), 0, base - 1)
+    def __init__(self, name: str, base: int = 8, sparse: bool = False):
+        super().__init__(name, '_base_n_', ce.BaseNEncoder(cols=[name]), 0, base - 1, sparse)
 
 
 class PolynomialEncoder(CEEncoder):
-    def __init__(self, name: str):
-        super().__init__(name, '_poly_', ce.PolynomialEncoder(cols=[name]), -1.0, None)
+    def __init__(self, name: str, sparse: bool = False):
+        super().__init__(name, '_poly_', ce.PolynomialEncoder(cols=[name]), -1.0, None, sparse)
 
 
 class CyclicalEncoder(Encoder):
@@ -105,16 +159,18 @@ class CyclicalEncoder(Encoder):
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
         if df[f"{self.name}"].max() > 1.0 or df[f"{self.name}"].min() < 0.0:
             raise ValueError(f"column {self.name} must be scaled in the range of 0.0 -> 1.0 before cyclical encoding")
-        df[f"{self.name}_sin"] = df[self.name].map(lambda x: math.sin(2 * math.pi * x))
-        df[f"{self.name}_cos"] = df[self.name].map(lambda x: math.cos(2 * math.pi * x))
+        radians = 2 * np.pi * df[self.name].to_numpy(dtype='float64')
+        df[f"{self.name}_sin"] = np.sin(radians)
+        df[f"{self.name}_cos"] = np.cos(radians)
         return df
 
 
 class BloomFilterEncoder(CEEncoder):
-    def __init__(self, name: str, hashes: int, bits: int):
-        super().__init__(name, '_bloom_', None, 0, 1)
+    def __init__(self, name: str, hashes: int, bits: int, sparse: bool = False):
+        super().__init__(name, '_bloom_', None, 0, 1, sparse)
         self._hashes = hashes
         self._bits = bits
+        self._columns = [f"{self.name}_bloom_{bit}" for bit in range(self.bits)]
 
     @property
     def hashes(self):
@@ -124,19 +180,42 @@ class BloomFilterEncoder(CEEncoder):
     def bits(self):
         return self._bits
 
+    def fit(self, df: pd.DataFrame) -> 'BloomFilterEncoder':
+        return self
+
     def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
         df_encoded = self.transform(df)
-        return df.join(df_encoded)
+        return pd.concat([df, df_encoded], axis=1)
 
     def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-        df_encoded = pd.DataFrame()
-        for i in range(0, self.hashes):
-            df_encoded['tmp'] = df[self.name].map(lambda v: BloomFilterEncoder.hash(i, v, self.bits))
-            for bit in range(0, self.bits):
-                bit_column = f"{self.name}{'_bloom_'}{bit}"
-                df_encoded.loc[df_encoded['tmp'] == bit, bit_column] = 1
-        return df_encoded.drop(columns=['tmp']).fillna(0)
+        return self.transform_columns(df)
+
+    def transform_matrix(self, df: pd.DataFrame):
+        # each distinct value is hashed once; missing values are coded as -1, which selects the extra last row
+        codes, categories = pd.factorize(df[self.name])
+        categories = list(categories) + [np.nan]
+        positions = np.array([[BloomFilterEncoder.hash(i, category, self.bits) for i in range(self.hashes)]
+                              for category in categories], dtype='int64').reshape(len(categories), self.hashes)
+        bit_matrix = np.zeros((len(categories), self.bits), dtype='uint8')
+        bit_matrix[np.arange(len(categories))[:, None], positions] = 1
+        if self._sparse:
+            return csr_matrix(bit_matrix)[codes]
+        return bit_matrix.take(codes, axis=0)
 
     @staticmethod
     def hash(hash_index, value, bits) -> int:
         return fnvhash.fnv1a_32((str(value) + str(hash_index)).encode()) % bits
+
+
+class EncoderTransformer(BaseEstimator, TransformerMixin):
+    # adapts an encoder to the scikit-learn transformer api, so it can be used in a Pipeline or FeatureUnion. only
+    # the encoded columns are returned, as a SciPy sparse matrix for sparse encoders
+    def __init__(self, encoder: CEEncoder):
+        self.encoder = encoder
+
+    def fit(self, x: pd.DataFrame, y=None):
+        self.encoder.fit(x)
+        return self
+
+    def transform(self, x: pd.DataFrame):
+        return self.encoder.transform_matrix(x)
@@ -0,0 +1,136 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from pandora.core_fields import GEO_CODE, DATE
+
+# the kinds of features, computed for each geo over the rows ordered by date:
+#   lag:  the value `shift` days before
+#   lead: the value `shift` days after
+#   diff: the value shifted by `shift` days, minus the value `window` days before it. a shift of -1 gives the change
+#         from today to tomorrow
+#   mean: the moving average over `window` days, of the values shifted by `shift` days. a shift of 1 averages the
+#         previous days only, excluding today
+# lags, leads and means fill the days before the first and after the last value of a geo with the nearest value,
+# while diffs are 0 where either value is missing
+LAG = 'lag'
+LEAD = 'lead'
+DIFF = 'diff'
+MEAN = 'mean'
+KINDS = [LAG, LEAD, DIFF, MEAN]
+
+
+class Feature:
+    def __init__(self,
+                 column: str,
+                 kind: str,
+                 window: int = 1,
+                 shift: int = 0,
+                 name: Optional[str] = None,
+                 minimum: Optional[float] = None):
+        if kind not in KINDS:
+            raise ValueError(f"unknown feature kind {kind}, expected one of {KINDS}")
+        self._column = column
+        self._kind = kind
+        self._window = window
+        self._shift = shift
+        self._name = name if name else f"{column}_{kind}_{window if kind in [DIFF, MEAN] else shift}"
+        self._minimum = minimum
+
+    @property
+    def column(self) -> str:
+        return self._column
+
+    @property
+    def kind(self) -> str:
+        return self._kind
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    @property
+    def shift(self) -> int:
+        return self._shift
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def minimum(self) -> Optional[float]:
+        return self._minimum
+
+    def with_window(self, window: int) -> 'Feature':
+        # keeps the name, so the columns derived from the feature do not change with the window
+        return Feature(self._column, self._kind, window, self._shift, self._name, self._minimum)
+
+
+def add_features(df: pd.DataFrame, features: [Feature]) -> pd.DataFrame:
+    return pd.concat([df, compute_features(df, features)], axis=1)
+
+
+def compute_features(df: pd.DataFrame, features: [Feature]) -> pd.DataFrame:
+    # the rows are ordered by geo and date once, and every feature is computed with grouped shifts and rolling windows
+    # over the ordered rows. features may refer to the columns of the features preceding them
+    geo_codes = pd.factorize(df[GEO_CODE])[0]
+    order = np.lexsort((df[DATE].to_numpy(), geo_codes))
+    groups = geo_codes[order]
+    columns = dict()
+    for feature in features:
+        if feature.column in columns:
+            values = columns[feature.column]
+        else:
+            values = pd.Series(df[feature.column].to_numpy(dtype='float64', na_value=np.nan)[order])
+        columns[feature.name] = compute_feature(values, groups, feature)
+    # the computed values are scattered back to the original row order
+    result = dict()
+    for feature in features:
+        values = np.empty(len(order), dtype='float64')
+        values[order] = columns[feature.name].to_numpy()
+        result[feature.name] = values
+    return pd.DataFrame(result, index=df.index)
+
+
+def compute_feature(values: pd.Series, groups: np.ndarray, feature: Feature) -> pd.Series:
+    if feature.kind == DIFF:
+        grouped = values.groupby(groups)
+        result = (grouped.shift(feature.shift) - grouped.shift(feature.shift + feature.window)).fillna(0.0)
+    else:
+        shift = -feature.shift if feature.kind == LEAD else feature.shift
+        result = fill_nearest(values.groupby(groups).shift(shift), groups)
+        if feature.kind == MEAN:
+            result = result.groupby(groups, sort=False).rolling(feature.window, min_periods=1).mean()
+            result = fill_nearest(result.reset_index(drop=True), groups)
+    if feature.minimum is not None:
+        result = result.clip(lower=feature.minimum)
+    return result
+
+
+def fill_nearest(values: pd.Series, groups: np.ndarray) -> pd.Series:
+    return values.groupby(groups).bfill().groupby(groups).ffill()
+
+
+class FeatureTransformer(BaseEstimator, TransformerMixin):
+    # adds the features to a frame in a scikit-learn pipeline. the windows maps feature names to the window to use
+    # instead of the one declared by the feature, so the windows can be searched as hyperparameters:
+    #
+    #   GridSearchCV(pipeline, {'features__windows': [{'cases_ma': 3}, {'cases_ma': 7}]})
+    #
+    # the names of the features stay the same, whatever their window
+    def __init__(self, features: [Feature], windows: Optional[Dict[str, int]] = None):
+        self.features = features
+        self.windows = windows
+
+    def fit(self, x: pd.DataFrame, y=None):
+        return self
+
+    def transform(self, x: pd.DataFrame) -> pd.DataFrame:
+        return add_features(x, self.resolve_features())
+
+    def resolve_features(self) -> [Feature]:
+        windows = self.windows if self.windows else dict()
+        return [feature.with_window(windows[feature.name]) if feature.name in windows else feature
+                for feature in self.features]
@@ -1,16 +1,54 @@
 from logging import info
+from typing import Dict, List, Optional, Tuple, Any
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype, is_float_dtype
 
-from pandora.core_fields import MISSING_INDICATOR_SUFFIX
+from pandora import profiler
+from pandora.core_fields import MISSING_INDICATOR_SUFFIX, COUNTRY_KEYS
 from pandora.core_types import Module, Imputation
+from pandora.imputers import GROUPED_IMPUTATIONS, AGGREGATE_IMPUTATIONS, CONSTANT_IMPUTATIONS, STATISTIC_IMPUTATIONS
 
 
-def impute(df: pd.DataFrame, module: Module) -> pd.DataFrame:
+class GlobalStatistics:
+    # the fill values of the imputation levels that group by no country key, by module location, feature and level,
+    # as tables of the level keys and the value. they are recorded while loading every geo, then frozen and used to
+    # load a subset of the geos, so those levels fill the same values as they would when loading every geo
+
+    def __init__(self):
+        self._tables = dict()
+        self._frozen = False
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self) -> 'GlobalStatistics':
+        self._frozen = True
+        return self
+
+    def get(self, location: str, name: str, level: int) -> Optional[pd.DataFrame]:
+        return self._tables.get((location, name, level))
+
+    def put(self, location: str, name: str, level: int, table: pd.DataFrame) -> None:
+        self._tables[(location, name, level)] = table
+
+
+def impute(df: pd.DataFrame,
+           module: Module,
+           statistics: Optional[GlobalStatistics] = None,
+           weights: Optional[np.ndarray] = None) -> pd.DataFrame:
+    # with weights, each row stands for that many identical rows, see is_plannable
     df = mark_missing(df, module)
-    df = impute_features(df, module)
-    df = df.reindex(sorted(df.columns), axis=1)
-    return df
+    return impute_features(df, module, statistics, weights)
+
+
+def is_plannable(module: Module, df: pd.DataFrame) -> bool:
+    # whether every imputation of the module compiles into a plan. plans only compute sums, counts, maxima and minima,
+    # so they can impute rows standing for several identical rows, weighted by the number of rows
+    return all(name in df.columns and is_numeric_dtype(df[name]) and compile_plan(imputations) is not None
+               for name, imputations in module.imputations.items())
 
 
 def mark_missing(df: pd.DataFrame, module: Module) -> pd.DataFrame:
@@ -19,19 +57,222 @@ def mark_missing(df: pd.DataFrame, module: Module) -> pd.DataFrame:
     return df
 
 
-def impute_features(df: pd.DataFrame, module: Module) -> pd.DataFrame:
-    for name in module.imputations:
-        info(f"{module.location} - imputing {name}")
-        for imputation in module.imputations[name]:
-            if df[name].isna().any():
-                df = impute_feature_by_series(df, name, imputation)
+def impute_features(df: pd.DataFrame,
+                    module: Module,
+                    statistics: Optional[GlobalStatistics] = None,
+                    weights: Optional[np.ndarray] = None) -> pd.DataFrame:
+    # chains of numeric features made only of aggregate and constant imputations are compiled into a plan, the others
+    # are imputed level by level. features sharing the same plan are imputed together
+    plans = dict()
+    remaining = dict()
+    for name, imputations in module.imputations.items():
+        plan = compile_plan(imputations)
+        if plan is not None and is_numeric_dtype(df[name]):
+            plans.setdefault(plan, []).append(name)
+        else:
+            remaining[name] = imputations
+    if weights is not None and remaining:
+        raise ValueError(f"{module.location} - {list(remaining)} can not be imputed with row weights")
+    with profiler.stage('impute', module.location, rows_in=len(df.index)):
+        for plan, names in plans.items():
+            info(f"{module.location} - imputing {names} by plan {[list(keys) for keys, _ in plan]}")
+            with profiler.stage('impute_plan', module.location, features=names) as record:
+                df = impute_features_by_plan(df,
+                                             names,
+                                             plan,
+                                             record.setdefault('levels', []),
+                                             module.location,
+                                             statistics,
+                                             weights)
+        return impute_features_by_level(df, module.location, remaining, statistics)
+
+
+def impute_features_by_level(df: pd.DataFrame,
+                             location: str,
+                             imputations: Dict[str, List[Imputation]],
+                             statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+    # the n-th imputation of every feature that still has missing values is applied in the same round, so features
+    # sharing the same keys and function are imputed with a single grouping pass
+    pending = dict(imputations)
+    level = 0
+    while pending:
+        missing = df[list(pending)].isna().any()
+        batches = dict()
+        for name, imputations in list(pending.items()):
+            if level >= len(imputations) or not missing[name]:
+                del pending[name]
+                continue
+            imputation = imputations[level]
+            batches.setdefault((tuple(imputation.keys), imputation.function), []).append(name)
+        for (keys, function), names in batches.items():
+            info(f"{location} - imputing {names} by {list(keys)}")
+            with profiler.stage('impute_level', location, level=level, keys=list(keys)) as record:
+                missing_before = df[names].isna().sum()
+                if statistics is not None and is_global(keys) and function in STATISTIC_IMPUTATIONS:
+                    df = impute_features_by_statistics(df, names, Imputation(function, list(keys)), level, location,
+                                                       statistics)
+                df = impute_features_by_group(df, names, Imputation(function, list(keys)))
+                record['filled'] = (missing_before - df[names].isna().sum()).to_dict()
+        level += 1
+    return df
+
+
+def compile_plan(imputations: List[Imputation]) -> Optional[Tuple[Tuple[Tuple[str], Any], ...]]:
+    plan = []
+    for imputation in imputations:
+        if imputation.function in AGGREGATE_IMPUTATIONS:
+            plan.append((tuple(imputation.keys), AGGREGATE_IMPUTATIONS[imputation.function]))
+        elif imputation.function in CONSTANT_IMPUTATIONS:
+            plan.append(((), CONSTANT_IMPUTATIONS[imputation.function]))
+        else:
+            return None
+    return tuple(plan)
+
+
+def impute_features_by_plan(df: pd.DataFrame,
+                            names: [str],
+                            plan: tuple,
+                            levels: [dict] = None,
+                            location: Optional[str] = None,
+                            statistics: Optional[GlobalStatistics] = None,
+                            weights: Optional[np.ndarray] = None) -> pd.DataFrame:
+    # the frame is aggregated once to the finest grouping used by the plan. since every level groups by a subset of
+    # those keys, all missing values of a fine group are filled at the same level with the same value, so each level
+    # can be computed from the aggregated table, including the values filled by the previous levels
+    names = [name for name in names if df[name].isna().any()]
+    if not names:
+        return df
+    finest_keys = list(dict.fromkeys(key for keys, _ in plan for key in keys))
+    codes = group_codes([df[key] for key in finest_keys], len(df.index))
+    size = codes.max() + 1
+    table_keys = df[finest_keys].iloc[np.unique(codes, return_index=True)[1]].reset_index(drop=True)
+    level_codes = [group_codes([table_keys[key] for key in keys], size) for keys, _ in plan]
+    weights = np.ones(len(df.index)) if weights is None else np.asarray(weights, dtype='float64')
+    rows = np.bincount(codes, weights=weights, minlength=size)
+    # the key values of the groups of each level, to record or look up the statistics of the global levels
+    level_values = [table_keys[list(keys)].iloc[np.unique(by, return_index=True)[1]].reset_index(drop=True)
+                    if statistics is not None and is_global(keys) else None
+                    for (keys, _), by in zip(plan, level_codes)]
+    for name in names:
+        values = df[name].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+        table = pd.DataFrame({'sum': np.bincount(codes, weights=np.where(valid, values * weights, 0.0), minlength=size),
+                              'count': np.bincount(codes, weights=valid * weights, minlength=size),
+                              'max': pd.Series(values).groupby(codes).max().reindex(range(size)).to_numpy(),
+                              'min': pd.Series(values).groupby(codes).min().reindex(range(size)).to_numpy()})
+        fill = np.full(size, np.nan)
+        for level, ((keys, aggregation), by) in enumerate(zip(plan, level_codes)):
+            pending = (table['count'].to_numpy() < rows) & np.isnan(fill)
+            if not pending.any():
+                break
+            if not isinstance(aggregation, str):
+                fill[pending] = aggregation
+                record_level(levels, level, keys, name, pending, rows - table['count'].to_numpy())
+                continue
+            # the current state of each fine group: the observed values, plus the value filled by a previous level
+            filled = ~np.isnan(fill)
+            current = pd.DataFrame({'sum': table['sum'] + np.where(filled, (rows - table['count']) * fill, 0.0),
+                                    'count': np.where(filled, rows, table['count']),
+                                    'max': np.fmax(table['max'], fill),
+                                    'min': np.fmin(table['min'], fill)}).groupby(by)
+            if aggregation == 'mean':
+                statistic = (current['sum'].sum() / current['count'].sum().replace(0, np.nan)).to_numpy()
+            else:
+                statistic = current[aggregation].agg(aggregation).to_numpy()
+            if level_values[level] is not None:
+                statistic = apply_statistics(statistics, location, name, level, level_values[level], statistic)
+            fill[pending] = statistic[by][pending]
+            record_level(levels, level, keys, name, pending & ~np.isnan(fill), rows - table['count'].to_numpy())
+        fill = pd.Series(fill.take(codes), index=df.index)
+        # keep compact float dtypes, instead of upcasting them to the dtype of the computed statistics
+        df[name] = df[name].fillna(fill.astype(df[name].dtype) if is_float_dtype(df[name]) else fill)
+    return df
+
+
+def is_global(keys: [str]) -> bool:
+    return not any(key in COUNTRY_KEYS for key in keys)
+
+
+def apply_statistics(statistics: GlobalStatistics,
+                     location: str,
+                     name: str,
+                     level: int,
+                     values: pd.DataFrame,
+                     statistic: np.ndarray) -> np.ndarray:
+    # records the statistic of each group of the level, or replaces it with the recorded one
+    if not statistics.frozen:
+        statistics.put(location, name, level, values.assign(**{name: statistic}))
+        return statistic
+    recorded = lookup_statistics(statistics.get(location, name, level), values, name)
+    return statistic if recorded is None else np.where(np.isnan(recorded), statistic, recorded)
+
+
+def lookup_statistics(table: Optional[pd.DataFrame], values: pd.DataFrame, name: str) -> Optional[np.ndarray]:
+    if table is None:
+        return None
+    if values.columns.empty:
+        return np.full(len(values.index), table[name].iloc[0], dtype='float64')
+    return values.merge(table, on=list(values.columns), how='left')[name].to_numpy(dtype='float64', na_value=np.nan)
+
+
+def impute_features_by_statistics(df: pd.DataFrame,
+                                  names: [str],
+                                  imputation: Imputation,
+                                  level: int,
+                                  location: str,
+                                  statistics: GlobalStatistics) -> pd.DataFrame:
+    # records the statistic of every group of a global level, or fills the missing values with the recorded ones. the
+    # values the recorded statistics do not cover are left to the grouped imputation
+    aggregation = STATISTIC_IMPUTATIONS[imputation.function]
+    keys = list(imputation.keys)
+    if not statistics.frozen:
+        if keys:
+            table = df.groupby(keys, sort=False, dropna=False, observed=True)[names].agg(aggregation).reset_index()
+        else:
+            table = df[names].agg(aggregation).to_frame().T
+        for name in names:
+            statistics.put(location, name, level, table[keys + [name]])
+        return df
+    values = df[keys]
+    for name in names:
+        recorded = lookup_statistics(statistics.get(location, name, level), values, name)
+        if recorded is not None:
+            fill = pd.Series(recorded, index=df.index)
+            df[name] = df[name].fillna(fill.astype(df[name].dtype) if is_float_dtype(df[name]) else fill)
+    return df
+
+
+def record_level(levels: Optional[List[dict]],
+                 level: int,
+                 keys: [str],
+                 name: str,
+                 filled: np.ndarray,
+                 missing: np.ndarray) -> None:
+    if levels is not None:
+        levels.append({'level': level, 'keys': list(keys), 'feature': name, 'filled': int(missing[filled].sum())})
+
+
+def group_codes(by: [pd.Series], size: int) -> np.ndarray:
+    if not by:
+        return np.zeros(size, dtype='int64')
+    return by[0].groupby(by, sort=False, dropna=False, observed=True).ngroup().to_numpy()
+
+
+def impute_features_by_group(df: pd.DataFrame, names: [str], imputation: Imputation) -> pd.DataFrame:
+    kernel = GROUPED_IMPUTATIONS.get(imputation.function)
+    if kernel is None:
+        for name in names:
+            df = impute_feature_by_series(df, name, imputation)
+        return df
+    by = [df[key] for key in imputation.keys] if imputation.keys else np.zeros(len(df.index), dtype='int8')
+    df[names] = df[names].fillna(kernel(df[names].groupby(by, sort=False, dropna=False, observed=True)))
     return df
 
 
 def impute_feature_by_series(df: pd.DataFrame, name: str, imputation: Imputation) -> pd.DataFrame:
     if imputation.keys:
-        return df.groupby(imputation.keys).apply(
-            lambda group: impute_group(group, name, imputation.function)).reset_index(drop=True)
+        return df.groupby(imputation.keys, group_keys=False, dropna=False, observed=True).apply(
+            lambda group: impute_group(group, name, imputation.function)).sort_index()
     else:
         return impute_group(df, name, imputation.function)
 
@@ -27,3 +27,33 @@ def impute_with_zero(df: pd.DataFrame, name):
 
 def impute_with_empty_string(df: pd.DataFrame, name):
     return df[name].fillna('')
+
+
+# grouped equivalents of the functions above, computing the fill values of every group in a single pass
+GROUPED_IMPUTATIONS = {
+    impute_with_median: lambda grouped: grouped.transform('median'),
+    impute_with_mean: lambda grouped: grouped.transform('mean'),
+    impute_with_max: lambda grouped: grouped.transform('max'),
+    impute_with_min: lambda grouped: grouped.transform('min'),
+    impute_with_forward_fill: lambda grouped: grouped.ffill().fillna(0),
+    impute_with_zero: lambda grouped: 0,
+    impute_with_empty_string: lambda grouped: ''
+}
+
+# imputations filling with a statistic that can be combined from partial aggregates, so a chain of them can be
+# computed on an aggregated table instead of the full frame
+AGGREGATE_IMPUTATIONS = {
+    impute_with_mean: 'mean',
+    impute_with_max: 'max',
+    impute_with_min: 'min'
+}
+
+# imputations filling with a statistic of the group, which can be looked up by the values of the group keys
+STATISTIC_IMPUTATIONS = {
+    **AGGREGATE_IMPUTATIONS,
+    impute_with_median: 'median'
+}
+
+CONSTANT_IMPUTATIONS = {
+    impute_with_zero: 0
+}
@@ -1,13 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import repeat
 from logging import info
-from typing import Optional
+from typing import Optional, Iterable, Dict, FrozenSet
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import is_categorical_dtype
 
+from pandora import cache, partitions, profiler, validation
 from pandora.core_fields import COUNTRY_CODE, COUNTRY_CODE3, COUNTRY_NAME, REGION_NAME, WEEK, MONTH, QUARTER, YEAR, \
-    DAY_OF_MONTH, DAY_OF_WEEK, DAY_OF_YEAR, DATE, GEO_CODE, COUNTRY_CODE_NUMERIC
+    DAY_OF_MONTH, DAY_OF_WEEK, DAY_OF_YEAR, DATE, GEO_CODE, COUNTRY_CODE_NUMERIC, MISSING_INDICATOR_SUFFIX
 from pandora.core_types import Module
-from pandora.imputer import impute
+from pandora.imputer import impute, is_plannable, group_codes, GlobalStatistics
+
+# the geo and date fields, which modules are expanded and merged on
+KEY_FIELDS = [GEO_CODE, COUNTRY_NAME, COUNTRY_CODE, COUNTRY_CODE3, COUNTRY_CODE_NUMERIC, REGION_NAME,
+              DATE, YEAR, QUARTER, MONTH, WEEK, DAY_OF_WEEK, DAY_OF_MONTH, DAY_OF_YEAR]
+
+# imputations grouping by these keys group nearly every day apart, so the modules are expanded to daily rows instead
+DAILY_KEYS = [DATE, DAY_OF_YEAR, DAY_OF_MONTH]
+
+# the keys a module can be filtered by country with, in the order of preference of the merge keys
+COUNTRY_FILTER_KEYS = [COUNTRY_CODE, COUNTRY_CODE3, COUNTRY_CODE_NUMERIC, COUNTRY_NAME]
 
 
 def load(start_date: datetime.date,
@@ -15,96 +31,466 @@ def load(start_date: datetime.date,
          imputation_window_start_date: datetime.date,
          imputation_window_end_date: datetime.date,
          geo_module: Module,
-         modules: [Module]) -> pd.DataFrame:
-    expansion_window = pd.date_range(min(imputation_window_start_date, start_date),
-                                     max(imputation_window_end_date, end_date),
-                                     freq='D')
-    df = load_module(geo_module, expansion_window)
-    df = merge_modules(df, modules, expansion_window)
-    df = df[(df[DATE] >= pd.to_datetime(start_date)) & (df[DATE] <= pd.to_datetime(end_date))]
-    df = df.sort_values(DATE)
-    df = df.reindex(sorted(df.columns), axis=1)
-    validate(df)
+         modules: [Module],
+         cache_location: Optional[str] = None,
+         workers: int = 1,
+         validation_sample: Optional[int] = None,
+         columns: Optional[Iterable[str]] = None,
+         geos: Optional[Iterable[str]] = None,
+         statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+    # with columns, only those columns are returned, along with the geo code and date. the modules then only parse,
+    # merge and impute the requested columns, and the keys needed to merge and impute them.
+    # with geos, country codes or geo codes, only those geos are returned. the modules are filtered right after they
+    # are parsed, keeping every geo of the countries of the geos, so the imputations grouping by country fill the
+    # same values as a full load. the imputations grouping by no country key only see the loaded countries, unless
+    # given the statistics recorded by global_statistics
+    with profiler.stage('load', start_date=start_date, end_date=end_date) as record:
+        expansion_window = resolve_expansion_window(start_date,
+                                                    end_date,
+                                                    imputation_window_start_date,
+                                                    imputation_window_end_date)
+        df = load_window(expansion_window, geo_module, modules, cache_location, workers, columns, geos, statistics)
+        df = select(df, start_date, end_date, resolve_schema(geo_module, modules), validation_sample)
+        record['rows_out'] = len(df.index)
+        return df
+
+
+def load_window(expansion_window: pd.DatetimeIndex,
+                geo_module: Module,
+                modules: [Module],
+                cache_location: Optional[str] = None,
+                workers: int = 1,
+                columns: Optional[Iterable[str]] = None,
+                geos: Optional[Iterable[str]] = None,
+                statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+    # the frame of the whole expansion window, before selecting the dates, see load
+    projection = None
+    if columns is not None:
+        columns = list(columns)
+        projection = resolve_projection(columns, modules)
+        modules = [project_module(module, projection) for module in modules]
+    geo_keys = None
+    if geos is not None:
+        geos = list(geos)
+        geo_keys = resolve_geo_keys(geos, [geo_module] + list(modules))
+    df = assemble(expansion_window, geo_module, modules, cache_location, workers, projection, geo_keys, statistics)
+    if geos is not None:
+        df = select_geos(df, geos)
+    if columns is not None:
+        df = project(df, columns)
     return df
 
 
-def merge_modules(df: pd.DataFrame, modules: [Module], expansion_window) -> pd.DataFrame:
+def global_statistics(start_date: datetime.date,
+                      end_date: datetime.date,
+                      imputation_window_start_date: datetime.date,
+                      imputation_window_end_date: datetime.date,
+                      geo_module: Module,
+                      modules: [Module],
+                      cache_location: Optional[str] = None,
+                      workers: int = 1) -> GlobalStatistics:
+    # records the statistics of the global imputation levels with a load of every geo. they can be reused by loads
+    # of any subset of the geos with the same dates and modules
+    expansion_window = resolve_expansion_window(start_date,
+                                                end_date,
+                                                imputation_window_start_date,
+                                                imputation_window_end_date)
+    statistics = GlobalStatistics()
+    with profiler.stage('global_statistics', start_date=start_date, end_date=end_date):
+        assemble(expansion_window, geo_module, modules, cache_location, workers, statistics=statistics)
+    return statistics.freeze()
+
+
+def resolve_expansion_window(start_date: datetime.date,
+                             end_date: datetime.date,
+                             imputation_window_start_date: datetime.date,
+                             imputation_window_end_date: datetime.date) -> pd.DatetimeIndex:
+    return pd.date_range(min(imputation_window_start_date, start_date),
+                         max(imputation_window_end_date, end_date),
+                         freq='D')
+
+
+def assemble(expansion_window: pd.DatetimeIndex,
+             geo_module: Module,
+             modules: [Module],
+             cache_location: Optional[str] = None,
+             workers: int = 1,
+             projection: Optional[FrozenSet[str]] = None,
+             geo_keys: Optional[Dict[str, FrozenSet[str]]] = None,
+             statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+    df = load_module(geo_module, expansion_window, cache_location, projection, geo_keys)
+    return merge_modules(df, modules, expansion_window, cache_location, workers, projection, geo_keys, statistics)
+
+
+def resolve_geo_keys(geos: [str], modules: [Module]) -> Dict[str, FrozenSet[str]]:
+    # the values of every country key of the countries of the geos, so each module can be filtered by whichever
+    # country key it has. the other country keys are looked up in the static modules mapping country codes to them
+    countries = {geo_code.split('/')[0] for geo_code in geos}
+    geo_keys = {COUNTRY_CODE: set(countries)}
     for module in modules:
-        df = merge_module(df, module, expansion_window)
+        if partitions.is_partitioned(module.location):
+            continue
+        names = list(pd.read_csv(module.location, nrows=0).columns)
+        other_names = [name for name in COUNTRY_FILTER_KEYS if name in names and name != COUNTRY_CODE]
+        if COUNTRY_CODE not in names or not other_names:
+            continue
+        df = pd.read_csv(module.location,
+                         keep_default_na=False,
+                         na_values='',
+                         dtype=module.schema,
+                         usecols=[COUNTRY_CODE] + other_names)
+        df = df[df[COUNTRY_CODE].isin(countries)]
+        for name in other_names:
+            geo_keys.setdefault(name, set()).update(df[name].dropna())
+    info(f"loading the geos of {sorted(countries)}")
+    return {name: frozenset(values) for name, values in geo_keys.items()}
+
+
+def filter_geos(df: pd.DataFrame, geo_keys: Dict[str, FrozenSet[str]]) -> pd.DataFrame:
+    # modules without a country key, such as modules keyed by date only, are not filtered
+    for name in COUNTRY_FILTER_KEYS:
+        if name in df.columns and name in geo_keys:
+            return df[df[name].isin(geo_keys[name])].reset_index(drop=True)
     return df
 
 
-def merge_module(df: pd.DataFrame, module: Module, expansion_window: pd.DatetimeIndex) -> pd.DataFrame:
-    df_new = load_module(module, expansion_window)
-    df = df.merge(df_new, on=resolve_merge_keys(df_new), how="left", suffixes=[None, '_R'])
-    for name in df.columns:
-        if name.endswith('_R'):
-            df = df.drop(name, axis=1)
-    df = impute(df, module)
+def select_geos(df: pd.DataFrame, geos: [str]) -> pd.DataFrame:
+    # a country code selects the country and its regions, a geo code selects that geo only
+    return df[df[GEO_CODE].isin(geos) | df[COUNTRY_CODE].isin(geos)].reset_index(drop=True)
+
+
+def resolve_projection(columns: [str], modules: [Module]) -> FrozenSet[str]:
+    # the requested columns, the geo and date keys used to expand and merge the modules, and transitively the keys
+    # the imputations of those columns group by, which may be columns of other modules
+    names = set(KEY_FIELDS)
+    for name in columns:
+        names.add(name[:-len(MISSING_INDICATOR_SUFFIX)] if name.endswith(MISSING_INDICATOR_SUFFIX) else name)
+    imputations = dict()
+    for module in modules:
+        for name, module_imputations in module.imputations.items():
+            imputations.setdefault(name, []).extend(module_imputations)
+    pending = list(names)
+    while pending:
+        for imputation in imputations.get(pending.pop(), []):
+            for key in imputation.keys:
+                if key not in names:
+                    names.add(key)
+                    pending.append(key)
+    return frozenset(names)
+
+
+def project_module(module: Module, projection: FrozenSet[str]) -> Module:
+    return Module(module.location,
+                  {name: imputations for name, imputations in module.imputations.items() if name in projection},
+                  [name for name in module.mark_missing if name in projection],
+                  module.schema)
+
+
+def project(df: pd.DataFrame, columns: [str]) -> pd.DataFrame:
+    unknown = [name for name in columns if name not in df.columns]
+    if unknown:
+        raise ValueError(f"unknown columns {unknown}")
+    names = set(columns + [GEO_CODE, DATE])
+    return df[[name for name in df.columns if name in names]]
+
+
+def select(df: pd.DataFrame,
+           start_date: datetime.date,
+           end_date: datetime.date,
+           schema: Optional[Dict[str, str]] = None,
+           validation_sample: Optional[int] = None) -> pd.DataFrame:
+    df = df[(df[DATE] >= pd.to_datetime(start_date)) & (df[DATE] <= pd.to_datetime(end_date))]
+    df = df.sort_values(DATE)
+    df = df.reindex(sorted(df.columns), axis=1)
+    validate(df, schema, validation_sample)
     return df
 
 
-def load_module(module: Module, expansion_window: pd.DatetimeIndex) -> pd.DataFrame:
+def resolve_schema(geo_module: Module, modules: [Module]) -> Dict[str, str]:
+    schema = dict()
+    for module in [geo_module] + list(modules):
+        schema.update(module.schema)
+    return schema
+
+
+def merge_modules(df: pd.DataFrame,
+                  modules: [Module],
+                  expansion_window: pd.DatetimeIndex,
+                  cache_location: Optional[str] = None,
+                  workers: int = 1,
+                  projection: Optional[FrozenSet[str]] = None,
+                  geo_keys: Optional[Dict[str, FrozenSet[str]]] = None,
+                  statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+    # every module is aligned onto the rows of the initial frame, and the final frame is assembled with a single
+    # concatenation. modules are loaded independently of each other, only the merges depend on the declared order
+    df = df.reset_index(drop=True)
+    columns = {name: df[name] for name in df.columns}
+    df_modules = load_modules(modules, expansion_window, cache_location, workers, projection, geo_keys)
+    for module, df_new in zip(modules, df_modules):
+        columns.update(merge_module(columns, module, df_new, statistics))
+    return pd.concat(columns.values(), axis=1)
+
+
+def merge_module(columns: Dict[str, pd.Series],
+                 module: Module,
+                 df_new: pd.DataFrame,
+                 statistics: Optional[GlobalStatistics] = None) -> Dict[str, pd.Series]:
+    with profiler.stage('merge', module.location, rows_in=len(df_new.index)) as record:
+        aligned = align_module(columns, module, df_new, statistics)
+        record['rows_out'] = len(next(iter(aligned.values())).index) if aligned else 0
+        record['columns_out'] = list(aligned)
+        return aligned
+
+
+def align_module(columns: Dict[str, pd.Series],
+                 module: Module,
+                 df_new: pd.DataFrame,
+                 statistics: Optional[GlobalStatistics] = None) -> Dict[str, pd.Series]:
+    if DATE not in df_new.columns:
+        return align_dimension(columns, module, df_new, statistics)
+    merge_keys = resolve_merge_keys(df_new)
+    collisions = [name for name in df_new.columns if name in columns and name not in merge_keys]
+    if collisions:
+        info(f"{module.location} - keeping existing values for {collisions}")
+    new_names = [name for name in df_new.columns if name not in columns]
+    df = pd.DataFrame({name: columns[name] for name in merge_keys})
+    df = df.merge(df_new[merge_keys + new_names], on=merge_keys, how='left', validate='many_to_one')
+    df = df.set_index(columns[merge_keys[0]].index)
+    # imputation may group by, or re-impute, columns of previously merged modules
+    required_names = [name for name in resolve_imputation_names(module) if name in columns and name not in df.columns]
+    df = df.join(pd.DataFrame({name: columns[name] for name in required_names}))
+    df = impute(df, module, statistics)
+    borrowed_names = set(merge_keys + required_names) - set(module.imputations)
+    return {name: df[name] for name in df.columns if name not in borrowed_names}
+
+
+def align_dimension(columns: Dict[str, pd.Series],
+                    module: Module,
+                    df_new: pd.DataFrame,
+                    statistics: Optional[GlobalStatistics] = None) -> Dict[str, pd.Series]:
+    # a dimension module is joined onto the distinct combinations of the frame columns it is merged on and imputed
+    # by, instead of onto every daily row. each combination is weighted by its number of rows, so the imputations
+    # compute the same means, maxima and minima as on the daily rows. the result is then broadcast to the rows once
+    merge_keys = resolve_dimension_keys(df_new)
+    collisions = [name for name in df_new.columns if name in columns and name not in merge_keys]
+    if collisions:
+        info(f"{module.location} - keeping existing values for {collisions}")
+    new_names = [name for name in df_new.columns if name not in columns]
+    required_names = [name for name in resolve_imputation_names(module)
+                      if name in columns and name not in merge_keys + new_names]
+    dimension_keys = merge_keys + required_names
+    index = columns[merge_keys[0]].index
+    codes = group_codes([columns[name] for name in dimension_keys], len(index))
+    positions = np.unique(codes, return_index=True)[1]
+    df = pd.DataFrame({name: columns[name].iloc[positions].to_numpy() for name in dimension_keys})
+    df = df.merge(df_new[merge_keys + new_names], on=merge_keys, how='left', validate='many_to_one')
+    info(f"{module.location} - imputing {len(df.index)} combinations of {dimension_keys} for {len(index)} rows")
+    df = impute(df, module, statistics, np.bincount(codes))
+    borrowed_names = set(dimension_keys) - set(module.imputations)
+    return {name: pd.Series(df[name].array.take(codes), index=index, name=name)
+            for name in df.columns if name not in borrowed_names}
+
+
+def resolve_imputation_names(module: Module) -> [str]:
+    names = list(module.imputations) + list(module.mark_missing)
+    for imputations in module.imputations.values():
+        for imputation in imputations:
+            names += imputation.keys
+    return list(dict.fromkeys(names))
+
+
+def load_modules(modules: [Module],
+                 expansion_window: pd.DatetimeIndex,
+                 cache_location: Optional[str] = None,
+                 workers: int = 1,
+                 projection: Optional[FrozenSet[str]] = None,
+                 geo_keys: Optional[Dict[str, FrozenSet[str]]] = None) -> Iterable[pd.DataFrame]:
+    # the modules are loaded as dimensions where possible, see is_dimension
+    if workers > 1 and len(modules) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(modules))) as executor:
+            if profiler.active() is None:
+                return list(executor.map(load_module,
+                                         modules,
+                                         repeat(expansion_window),
+                                         repeat(cache_location),
+                                         repeat(projection),
+                                         repeat(geo_keys),
+                                         repeat(True)))
+            # the stages run in the worker processes are recorded there, and handed back with the frames
+            results = list(executor.map(load_module_profiled,
+                                        modules,
+                                        repeat(expansion_window),
+                                        repeat(cache_location),
+                                        repeat(projection),
+                                        repeat(geo_keys),
+                                        repeat(True)))
+            for _, records in results:
+                for record in records:
+                    profiler.active().add(record)
+            return [df for df, _ in results]
+    # when loading serially, each module is only loaded once the previous one is merged
+    return (load_module(module, expansion_window, cache_location, projection, geo_keys, True) for module in modules)
+
+
+def load_module_profiled(module: Module,
+                         expansion_window: pd.DatetimeIndex,
+                         cache_location: Optional[str] = None,
+                         projection: Optional[FrozenSet[str]] = None,
+                         geo_keys: Optional[Dict[str, FrozenSet[str]]] = None,
+                         dimension: bool = False) -> (pd.DataFrame, [dict]):
+    with profiler.Profiler() as module_profiler:
+        df = load_module(module, expansion_window, cache_location, projection, geo_keys, dimension)
+    return df, module_profiler.records
+
+
+def load_module(module: Module,
+                expansion_window: pd.DatetimeIndex,
+                cache_location: Optional[str] = None,
+                projection: Optional[FrozenSet[str]] = None,
+                geo_keys: Optional[Dict[str, FrozenSet[str]]] = None,
+                dimension: bool = False) -> pd.DataFrame:
+    with profiler.stage('load_module', module.location) as record:
+        record['cached'] = False
+        if cache_location:
+            # the schema sets the parsed dtypes, and modules may be defined outside of the pandora sources
+            options = [sorted(module.schema.items())]
+            options += [sorted(projection)] if projection else []
+            options += [sorted(geo_keys[COUNTRY_CODE])] if geo_keys else []
+            options += ['dimension'] if dimension else []
+            cache_key = cache.key(module.location, expansion_window, *options)
+            df = cache.get(cache_location, module.location, cache_key)
+            record['cached'] = df is not None
+            if df is None:
+                df = parse_module(module, expansion_window, projection, geo_keys, dimension)
+                cache.put(cache_location, module.location, cache_key, df)
+        else:
+            df = parse_module(module, expansion_window, projection, geo_keys, dimension)
+        record['rows_out'] = len(df.index)
+        return df
+
+
+def parse_module(module: Module,
+                 expansion_window: pd.DatetimeIndex,
+                 projection: Optional[FrozenSet[str]] = None,
+                 geo_keys: Optional[Dict[str, FrozenSet[str]]] = None,
+                 dimension: bool = False) -> pd.DataFrame:
+    # with dimension, a module qualifying as a dimension is returned without being expanded, see align_dimension
     info(f"{module.location} - loading")
-    df = pd.read_csv(module.location, keep_default_na=False, na_values='')
+    with profiler.stage('read', module.location) as record:
+        df = read_module(module, expansion_window, projection)
+        record['rows_out'] = len(df.index)
     df = impute_keys(df)
-    df = expand(df, expansion_window)
+    if geo_keys:
+        with profiler.stage('filter_geos', module.location, rows_in=len(df.index)) as record:
+            df = filter_geos(df, geo_keys)
+            record['rows_out'] = len(df.index)
+    if dimension and is_dimension(module, df):
+        info(f"{module.location} - keeping {len(df.index)} rows as a dimension")
+        return df
+    with profiler.stage('expand', module.location, rows_in=len(df.index)) as record:
+        df = expand(df, expansion_window)
+        record['rows_out'] = len(df.index)
+    return df
+
+
+def read_module(module: Module,
+                expansion_window: pd.DatetimeIndex,
+                projection: Optional[FrozenSet[str]] = None) -> pd.DataFrame:
+    # the expansion window is pushed down: only the partitions overlapping it are read, and rows dated outside of it
+    # are dropped right away, since they would not match any row of the expanded frame. likewise, only the columns
+    # of the projection are parsed
+    usecols = (lambda name: name in projection) if projection else None
+    if partitions.is_partitioned(module.location):
+        df = partitions.read(module.location,
+                             expansion_window[0],
+                             expansion_window[-1],
+                             keep_default_na=False,
+                             na_values='',
+                             dtype=module.schema,
+                             usecols=usecols)
+    else:
+        df = pd.read_csv(module.location, keep_default_na=False, na_values='', dtype=module.schema, usecols=usecols)
+    if DATE in df.columns:
+        df[DATE] = pd.to_datetime(df[DATE])
+        df = df[df[DATE].between(expansion_window[0], expansion_window[-1])].reset_index(drop=True)
     return df
 
 
 def impute_keys(df: pd.DataFrame) -> pd.DataFrame:
     if REGION_NAME in df.columns:
+        if is_categorical_dtype(df[REGION_NAME]) and '' not in df[REGION_NAME].cat.categories:
+            df[REGION_NAME] = df[REGION_NAME].cat.add_categories('')
         df[REGION_NAME] = df[REGION_NAME].fillna('')
     if REGION_NAME in df.columns and COUNTRY_CODE in df.columns:
-        df[GEO_CODE] = df[[COUNTRY_CODE, REGION_NAME]].apply(
-            lambda x: x[COUNTRY_CODE] if x[REGION_NAME] == '' else (x[COUNTRY_CODE] + '/' + x[REGION_NAME]), axis=1)
+        country_code = df[COUNTRY_CODE].astype(object)
+        region_name = df[REGION_NAME].astype(object)
+        df[GEO_CODE] = country_code.where(region_name == '', country_code + '/' + region_name)
+        if is_categorical_dtype(df[COUNTRY_CODE]):
+            df[GEO_CODE] = df[GEO_CODE].astype('category')
     return df
 
 
+def is_dimension(module: Module, df: pd.DataFrame) -> bool:
+    # modules without dates, keyed by geo and at most by coarse date fields, whose imputations are all plannable and
+    # do not group by day. the other modules, such as the ones imputed with medians, are expanded to daily rows
+    if DATE in df.columns or not resolve_dimension_keys(df):
+        return False
+    keys = {key for imputations in module.imputations.values() for imputation in imputations for key in imputation.keys}
+    return not keys.intersection(DAILY_KEYS) and is_plannable(module, df)
+
+
+def resolve_dimension_keys(df: pd.DataFrame) -> [str]:
+    return resolve_merge_keys(df)[1:] + resolve_expansion_keys(df)
+
+
 def expand(df: pd.DataFrame, expansion_window: pd.DatetimeIndex) -> pd.DataFrame:
     # perform an expansion if there is no date/time column
     if DATE in df.columns:
         df[DATE] = pd.to_datetime(df[DATE])
     else:
-        expansion_conditions = resolve_expansion_conditions(df)
-        if expansion_conditions:
-            df[DATE] = df.apply(lambda r: expansion_window[pd.eval(expansion_conditions,
-                                                                   engine='python')], axis=1)
+        df_calendar = build_calendar(expansion_window)
+        expansion_keys = resolve_expansion_keys(df)
+        if expansion_keys:
+            df = df.merge(df_calendar[expansion_keys + [DATE]], on=expansion_keys, how='inner')
         else:
-            df[DATE] = df.apply(lambda r: expansion_window, axis=1)
-        df = df.explode(DATE, ignore_index=True).reset_index(0, drop=True)
+            df = df.merge(df_calendar[[DATE]], how='cross')
     # after expanding, add date/time features
-    df[WEEK] = df[DATE].map(lambda x: x.isocalendar()[1])
-    df[MONTH] = df[DATE].map(lambda x: x.month)
-    df[QUARTER] = df[DATE].map(lambda x: x.quarter)
-    df[YEAR] = df[DATE].map(lambda x: x.year)
-    df[DAY_OF_YEAR] = df[DATE].map(lambda x: x.timetuple().tm_yday)
-    df[DAY_OF_MONTH] = df[DATE].map(lambda x: x.timetuple().tm_mday)
-    df[DAY_OF_WEEK] = df[DATE].map(lambda x: x.weekday() + 1)
+    return add_date_fields(df)
+
+
+def add_date_fields(df: pd.DataFrame) -> pd.DataFrame:
+    # the fields are derived once per unique date, then broadcast to the rows by the date codes
+    codes, dates = pd.factorize(df[DATE], sort=True)
+    if (codes < 0).any():
+        raise ValueError(f"{DATE} has NA values")
+    for name, values in date_fields(pd.DatetimeIndex(dates)).items():
+        df[name] = values.take(codes)
     return df
 
 
-def resolve_expansion_conditions(df: pd.DataFrame) -> Optional[str]:
-    conditions = []
-    for name in df.columns:
-        if name == YEAR:
-            conditions.append('expansion_window.year == r[YEAR]')
-        elif name == MONTH:
-            conditions.append('expansion_window.month == r[MONTH]')
-        elif name == QUARTER:
-            conditions.append('expansion_window.quarter == r[QUARTER]')
-        elif name == WEEK:
-            conditions.append('expansion_window.isocalendar().week == r[WEEK]')
-        elif name == DAY_OF_WEEK:
-            conditions.append('(expansion_window.day_of_week + 1) == r[DAY_OF_WEEK]')
-        elif name == DAY_OF_MONTH:
-            conditions.append('expansion_window.timetuple().tm_mday == r[DAY_OF_MONTH]')
-        elif name == DAY_OF_YEAR:
-            conditions.append('expansion_window.day_of_year == r[DAY_OF_YEAR]')
-    if conditions:
-        return ' and '.join([condition for condition in conditions])
-    else:
-        return None
+def date_fields(dates: pd.DatetimeIndex) -> dict:
+    return {WEEK: dates.isocalendar().week.to_numpy(dtype='int8'),
+            MONTH: dates.month.to_numpy(dtype='int8'),
+            QUARTER: dates.quarter.to_numpy(dtype='int8'),
+            YEAR: dates.year.to_numpy(dtype='int16'),
+            DAY_OF_YEAR: dates.dayofyear.to_numpy(dtype='int16'),
+            DAY_OF_MONTH: dates.day.to_numpy(dtype='int8'),
+            DAY_OF_WEEK: (dates.dayofweek + 1).to_numpy(dtype='int8')}
+
+
+def build_calendar(expansion_window: pd.DatetimeIndex) -> pd.DataFrame:
+    # the calendar only depends on the bounds of the window, so it is built once per window and reused by all modules
+    return _build_calendar(expansion_window[0], expansion_window[-1])
+
+
+@lru_cache(maxsize=8)
+def _build_calendar(start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    dates = pd.date_range(start, end, freq='D')
+    return pd.DataFrame({DATE: dates, **date_fields(dates)})
+
+
+def resolve_expansion_keys(df: pd.DataFrame) -> [str]:
+    return [name for name in [YEAR, QUARTER, MONTH, WEEK, DAY_OF_WEEK, DAY_OF_MONTH, DAY_OF_YEAR] if name in df.columns]
 
 
 def resolve_merge_keys(df: pd.DataFrame) -> [str]:
@@ -124,9 +510,7 @@ def resolve_merge_keys(df: pd.DataFrame) -> [str]:
     return keys
 
 
-def validate(df: pd.DataFrame) -> None:
-    info(f"validating fields")
-    for name in df.columns:
-        if df[name].isna().any():
-            print(df[[COUNTRY_CODE, COUNTRY_NAME]].tail(10))
-            raise ValueError(f"{name} has NA values")
+def validate(df: pd.DataFrame, schema: Optional[Dict[str, str]] = None, sample: Optional[int] = None) -> None:
+    report = validation.validate(df, schema, sample=sample)
+    if not report.valid:
+        raise ValueError(f"invalid fields: {report}")
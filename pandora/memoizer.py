@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from datetime import datetime
+from logging import info
+from typing import Optional, Iterable
+
+import pandas as pd
+
+from pandora import loader
+from pandora.core_types import Module
+from pandora.imputer import GlobalStatistics
+
+
+class MemoizingLoader:
+    # keeps the merged and imputed frames of recent expansion windows in memory. imputation runs over the whole
+    # expansion window, so a frame is only reused by requests resolving to the same window, such as requests sliding
+    # the start and end dates within a fixed imputation window; those are answered by slicing the cached frame.
+    # with reuse_enclosing_windows, a request is also answered by slicing the frame of a cached window enclosing its
+    # own, which is faster, but imputes it with the statistics of the enclosing window instead of its own.
+
+    def __init__(self,
+                 max_bytes: int = 2 ** 30,
+                 cache_location: Optional[str] = None,
+                 reuse_enclosing_windows: bool = False):
+        self._max_bytes = max_bytes
+        self._cache_location = cache_location
+        self._reuse_enclosing_windows = reuse_enclosing_windows
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    def load(self,
+             start_date: datetime.date,
+             end_date: datetime.date,
+             imputation_window_start_date: datetime.date,
+             imputation_window_end_date: datetime.date,
+             geo_module: Module,
+             modules: [Module],
+             cache_location: Optional[str] = None,
+             workers: int = 1,
+             validation_sample: Optional[int] = None,
+             columns: Optional[Iterable[str]] = None,
+             geos: Optional[Iterable[str]] = None,
+             statistics: Optional[GlobalStatistics] = None) -> pd.DataFrame:
+        # the options are those of loader.load. the ones changing the frame are part of the key, the cache location,
+        # workers and validation sample are not
+        expansion_window = loader.resolve_expansion_window(start_date,
+                                                           end_date,
+                                                           imputation_window_start_date,
+                                                           imputation_window_end_date)
+        columns = None if columns is None else list(columns)
+        geos = None if geos is None else list(geos)
+        options = (geo_module,
+                   tuple(modules),
+                   None if columns is None else tuple(columns),
+                   None if geos is None else tuple(sorted(geos)),
+                   statistics)
+        key = self.find(options, expansion_window)
+        if key is not None:
+            self._hits += 1
+            self._entries.move_to_end(key)
+            df, _ = self._entries[key]
+        else:
+            self._misses += 1
+            df = loader.load_window(expansion_window,
+                                    geo_module,
+                                    modules,
+                                    cache_location if cache_location else self._cache_location,
+                                    workers,
+                                    columns,
+                                    geos,
+                                    statistics)
+            self.put(options + (expansion_window[0], expansion_window[-1]), df)
+        return loader.select(df, start_date, end_date, loader.resolve_schema(geo_module, modules), validation_sample)
+
+    def find(self, options: tuple, expansion_window: pd.DatetimeIndex) -> Optional[tuple]:
+        key = options + (expansion_window[0], expansion_window[-1])
+        if key in self._entries or not self._reuse_enclosing_windows:
+            return key if key in self._entries else None
+        for entry_key in reversed(self._entries):
+            start, end = entry_key[-2:]
+            if entry_key[:-2] == options and start <= expansion_window[0] and expansion_window[-1] <= end:
+                info(f"reusing the frame of the enclosing window {start.date()} - {end.date()}")
+                return entry_key
+        return None
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self._max_bytes:
+            info(f"frame of {size} bytes exceeds the cache size of {self._max_bytes} bytes, not caching")
+            return
+        self._entries[key] = (df, size)
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,81 @@
+import os
+import pathlib
+from logging import info
+from typing import Optional
+
+import pandas as pd
+
+from pandora.core_fields import DATE
+
+# a partitioned module location is a directory holding one csv file per month of data, named YYYY-MM.csv
+PARTITION_PATTERN = '[0-9][0-9][0-9][0-9]-[0-9][0-9].csv'
+
+
+def is_partitioned(location: str) -> bool:
+    return os.path.isdir(location)
+
+
+def list_partitions(location: str,
+                    start_date: Optional[pd.Timestamp] = None,
+                    end_date: Optional[pd.Timestamp] = None) -> [pathlib.Path]:
+    # when given, only the partitions of the months overlapping the dates are listed
+    paths = sorted(pathlib.Path(location).glob(PARTITION_PATTERN))
+    if start_date is not None:
+        paths = [path for path in paths if path.stem >= f"{start_date:%Y-%m}"]
+    if end_date is not None:
+        paths = [path for path in paths if path.stem <= f"{end_date:%Y-%m}"]
+    return paths
+
+
+def resolve_partition(location: str, period: pd.Period) -> pathlib.Path:
+    return pathlib.Path(location) / f"{period.year:04d}-{period.month:02d}.csv"
+
+
+def read(location: str,
+         start_date: Optional[pd.Timestamp] = None,
+         end_date: Optional[pd.Timestamp] = None,
+         dtype: dict = None,
+         **kwargs) -> pd.DataFrame:
+    paths = list_partitions(location)
+    if not paths:
+        raise FileNotFoundError(f"no partitions found in {location}")
+    selected = list_partitions(location, start_date, end_date)
+    frames = [pd.read_csv(path, dtype=dtype, **kwargs) for path in selected]
+    if not frames:
+        # no partition overlaps the dates, the header of the first one gives the columns of the empty frame
+        frames = [pd.read_csv(paths[0], dtype=dtype, nrows=0, **kwargs)]
+    df = pd.concat(frames, ignore_index=True)
+    # categories differ between the partitions, so categorical columns are restored after concatenating
+    if dtype:
+        df = df.astype({name: dtype[name] for name in df.columns if dtype.get(name) == 'category'})
+    return df
+
+
+def append(df: pd.DataFrame, location: str) -> None:
+    # rows are appended to the partition of their month, creating it when needed
+    pathlib.Path(location).mkdir(parents=True, exist_ok=True)
+    for period, df_partition in df.groupby(df[DATE].dt.to_period('M')):
+        path = resolve_partition(location, period)
+        if path.exists():
+            columns = pd.read_csv(path, nrows=0).columns
+            df_partition[columns].to_csv(path, mode='a', header=False, index=False)
+        else:
+            df_partition.to_csv(path, index=False)
+        info(f"appended {len(df_partition.index)} rows to {path}")
+
+
+def replace(df: pd.DataFrame, location: str) -> None:
+    # the partitions of the months of the rows are rewritten with those rows only. each partition is written to a
+    # temporary file first, so readers never see a partially written partition
+    pathlib.Path(location).mkdir(parents=True, exist_ok=True)
+    for period, df_partition in df.groupby(df[DATE].dt.to_period('M')):
+        path = resolve_partition(location, period)
+        path_tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        df_partition.to_csv(path_tmp, index=False)
+        os.replace(path_tmp, path)
+        info(f"wrote {len(df_partition.index)} rows to {path}")
+
+
+def clear(location: str) -> None:
+    for path in list_partitions(location):
+        path.unlink()
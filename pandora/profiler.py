@@ -0,0 +1,99 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional, List
+
+_active = ContextVar('profiler', default=None)
+
+
+class Profiler:
+    # records wall time, peak memory and row counts of the loader and imputer stages executed while it is active:
+    #
+    #   with Profiler() as profiler:
+    #       loader.load(...)
+    #   profiler.to_json('report.json')
+    #
+    # each finished stage is also passed to the optional callback
+
+    def __init__(self, trace_memory: bool = True, callback: Optional[Callable[[dict], None]] = None):
+        self._trace_memory = trace_memory
+        self._callback = callback
+        self._records = []
+        self._stack = []
+        self._started_tracing = False
+        self._token = None
+
+    @property
+    def records(self) -> List[dict]:
+        return self._records
+
+    def __enter__(self):
+        if self._trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str, location: Optional[str] = None, **attributes):
+        record = {'stage': name, 'location': location, 'depth': len(self._stack), **attributes}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            memory_start = tracemalloc.get_traced_memory()[0]
+            reset_peak()
+        # holds the highest absolute peak seen by the nested stages, since each of them resets the peak
+        frame = [0]
+        self._stack.append(frame)
+        time_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - time_start
+            self._stack.pop()
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[0])
+                record['peak_bytes'] = peak - memory_start
+                if self._stack:
+                    self._stack[-1][0] = max(self._stack[-1][0], peak)
+            self.add(record)
+
+    def add(self, record: dict) -> None:
+        self._records.append(record)
+        if self._callback:
+            self._callback(record)
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        report = json.dumps({'records': self._records}, indent=2, default=str)
+        if path:
+            with open(path, 'w') as file:
+                file.write(report)
+        return report
+
+
+def active() -> Optional[Profiler]:
+    return _active.get()
+
+
+@contextmanager
+def stage(name: str, location: Optional[str] = None, **attributes):
+    # records a stage on the active profiler; without one, the record is discarded
+    profiler = _active.get()
+    if profiler is None:
+        yield dict()
+    else:
+        with profiler.stage(name, location, **attributes) as record:
+            yield record
+
+
+def reset_peak() -> None:
+    # tracemalloc.reset_peak is only available from python 3.9, earlier versions report the peak since tracing started
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
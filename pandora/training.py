@@ -0,0 +1,112 @@
+from logging import info
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+from category_encoders import BinaryEncoder
+from joblib import Memory
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.preprocessing import StandardScaler
+
+SECONDS_PER_DAY = 86400
+
+
+class FeatureMatrix:
+    # a frame converted once into a float32 matrix, stored in a memory mapped file. scikit-learn hands memory mapped
+    # arrays to the joblib workers of a grid search by reference, so the workers map the same pages instead of each
+    # unpickling a copy of the frame. nominal columns are stored as their codes, and dates as days since the epoch.
+    # the matrix is column major, so selecting a column reads a contiguous block
+    def __init__(self, values: np.ndarray, columns: [str], categories: Dict[str, pd.Index]):
+        self._values = values
+        self._columns = columns
+        self._categories = categories
+        self._positions = {name: position for position, name in enumerate(columns)}
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values
+
+    @property
+    def columns(self) -> [str]:
+        return self._columns
+
+    @property
+    def categories(self) -> Dict[str, pd.Index]:
+        return self._categories
+
+    def index(self, name: str) -> int:
+        return self._positions[name]
+
+    def indices(self, names: [str]) -> [int]:
+        return [self._positions[name] for name in names]
+
+    def rows(self, start: Optional[int] = None, stop: Optional[int] = None) -> np.ndarray:
+        # a slice of rows is a view of the same memory mapped file, unlike a selection by a list of rows
+        return self._values[start:stop]
+
+
+def to_matrix(df: pd.DataFrame, location: str, columns: Optional[list] = None) -> FeatureMatrix:
+    columns = list(columns) if columns is not None else list(df.columns)
+    info(f"writing a {len(df.index)} x {len(columns)} feature matrix to {location}")
+    values = np.lib.format.open_memmap(location,
+                                       mode='w+',
+                                       dtype='float32',
+                                       shape=(len(df.index), len(columns)),
+                                       fortran_order=True)
+    categories = dict()
+    for position, name in enumerate(columns):
+        values[:, position], column_categories = encode_column(df[name])
+        if column_categories is not None:
+            categories[name] = column_categories
+    values.flush()
+    del values
+    return FeatureMatrix(np.load(location, mmap_mode='r'), columns, categories)
+
+
+def encode_column(series: pd.Series) -> (np.ndarray, Optional[pd.Index]):
+    if is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype='datetime64[s]').astype('int64') / SECONDS_PER_DAY, None
+    if is_bool_dtype(series) or is_numeric_dtype(series):
+        return series.to_numpy(dtype='float32', na_value=np.nan), None
+    # missing values keep the code -1 of factorize
+    codes, categories = pd.factorize(series, sort=True)
+    return codes, categories
+
+
+class ColumnSelector(BaseEstimator, TransformerMixin):
+    # selects columns of a matrix by their position, see FeatureMatrix.indices
+    def __init__(self, indices: [int]):
+        self.indices = indices
+
+    def fit(self, x, y=None):
+        return self
+
+    def transform(self, x):
+        return x[:, self.indices]
+
+
+def numeric(matrix: FeatureMatrix, name: str) -> (str, Pipeline):
+    return (name, Pipeline([
+        (name + '.select', ColumnSelector([matrix.index(name)])),
+        (name + '.scale', StandardScaler())
+    ]))
+
+
+def nominal(matrix: FeatureMatrix, name: str) -> (str, Pipeline):
+    # the selected column holds the codes of the nominal values
+    return (name, Pipeline([
+        (name + '.select', ColumnSelector([matrix.index(name)])),
+        (name + '.scale', BinaryEncoder(cols=[0]))
+    ]))
+
+
+def build_pipeline(features: [(str, Pipeline)], estimator, memory: Union[str, Memory, None] = None) -> Pipeline:
+    # with a memory, the fitted feature union is cached under a hash of its parameters and of the rows it is fit on.
+    # the candidates of a grid search varying only the estimator parameters then fit the features once per fold,
+    # and only refit the estimator
+    return Pipeline([
+        ('features', FeatureUnion(features)),
+        ('estimator', estimator)
+    ], memory=memory)
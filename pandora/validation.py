@@ -0,0 +1,128 @@
+from logging import info
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_integer_dtype, pandas_dtype
+
+from pandora.core_fields import GEO_CODE, DATE, YEAR, QUARTER, MONTH, WEEK, DAY_OF_YEAR, DAY_OF_MONTH, DAY_OF_WEEK
+
+NA = 'na'
+DTYPE = 'dtype'
+RANGE = 'range'
+
+# the valid values of the standard date fields, see the README
+RANGES = {
+    YEAR: (0, 4000),
+    QUARTER: (1, 4),
+    MONTH: (1, 12),
+    WEEK: (1, 53),
+    DAY_OF_YEAR: (1, 366),
+    DAY_OF_MONTH: (1, 31),
+    DAY_OF_WEEK: (1, 7)
+}
+
+
+class Violation:
+    def __init__(self, column: str, check: str, positions: np.ndarray, message: str):
+        self._column = column
+        self._check = check
+        self._positions = positions
+        self._message = message
+
+    @property
+    def column(self) -> str:
+        return self._column
+
+    @property
+    def check(self) -> str:
+        return self._check
+
+    @property
+    def positions(self) -> np.ndarray:
+        # the positions of the offending rows in the validated frame, empty when the whole column is offending
+        return self._positions
+
+    @property
+    def message(self) -> str:
+        return self._message
+
+
+class ValidationReport:
+    def __init__(self, df: pd.DataFrame, violations: [Violation], rows_checked: int):
+        self._df = df
+        self._violations = violations
+        self._rows_checked = rows_checked
+
+    @property
+    def violations(self) -> [Violation]:
+        return self._violations
+
+    @property
+    def valid(self) -> bool:
+        return not self._violations
+
+    @property
+    def rows_checked(self) -> int:
+        return self._rows_checked
+
+    @property
+    def sampled(self) -> bool:
+        return self._rows_checked < len(self._df.index)
+
+    def rows(self) -> pd.DataFrame:
+        # the (geo, date) of every offending row, with the column and check it violates
+        keys = [key for key in [GEO_CODE, DATE] if key in self._df.columns]
+        frames = [self._df[keys].iloc[violation.positions].assign(column=violation.column, check=violation.check)
+                  for violation in self._violations if len(violation.positions)]
+        if not frames:
+            return pd.DataFrame(columns=keys + ['column', 'check'])
+        return pd.concat(frames)
+
+    def __str__(self) -> str:
+        return '; '.join(violation.message for violation in self._violations)
+
+
+def validate(df: pd.DataFrame,
+             schema: Optional[Dict[str, str]] = None,
+             ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+             sample: Optional[int] = None,
+             random_state: Optional[int] = None) -> ValidationReport:
+    # every column is checked for missing values, for its dtype, and for the range of its values, reading its array
+    # once. with a sample, only that many randomly chosen rows are checked, the dtypes are always checked
+    schema = schema if schema else dict()
+    ranges = RANGES if ranges is None else ranges
+    rows = len(df.index)
+    positions = np.arange(rows)
+    if sample is not None and sample < rows:
+        positions = np.sort(np.random.default_rng(random_state).choice(rows, sample, replace=False))
+    info(f"validating {len(positions)} of {rows} rows")
+    violations = []
+    for name in df.columns:
+        column = df[name]
+        message = check_dtype(column, schema.get(name))
+        if message:
+            violations.append(Violation(name, DTYPE, np.empty(0, dtype='int64'), f"{name} {message}"))
+            continue
+        values = column.iloc[positions] if len(positions) < rows else column
+        missing = values.isna().to_numpy()
+        if missing.any():
+            violations.append(Violation(name, NA, positions[missing], f"{name} has {missing.sum()} NA values"))
+        if name in ranges:
+            minimum, maximum = ranges[name]
+            array = values.to_numpy(dtype='float64', na_value=np.nan)
+            outside = (array < minimum) | (array > maximum)
+            if outside.any():
+                violations.append(Violation(name, RANGE, positions[outside],
+                                            f"{name} has {outside.sum()} values outside of {minimum} - {maximum}"))
+    return ValidationReport(df, violations, len(positions))
+
+
+def check_dtype(column: pd.Series, expected: Optional[str]) -> Optional[str]:
+    if expected is not None and column.dtype.name != pandas_dtype(expected).name:
+        return f"has dtype {column.dtype.name} instead of {pandas_dtype(expected).name}"
+    if column.name == DATE and not is_datetime64_any_dtype(column):
+        return f"has dtype {column.dtype.name} instead of a datetime"
+    if column.name in RANGES and not is_integer_dtype(column):
+        return f"has dtype {column.dtype.name} instead of an integer"
+    return None
@@ -10,12 +10,14 @@ setup(
     author_email='rick.billeci@gmail.com',
     description='',
     package_data={
-        "pandora": ["data/*.*"]  # include all files in the data directory
+        "pandora": ["data/*.*", "data/*/*.csv"]  # include all files in the data directory, and partitioned datasets
     },
     install_requires=[
         'pandas~=1.2.1',
         'fnvhash~=0.1.0',
         'scikit-learn~=0.24.1',
         'workalendar~=14.1.0',
-        'category-encoders~=2.2.2']
+        'category-encoders~=2.2.2',
+        'pyarrow~=3.0.0',
+        'scipy~=1.6.0']
 )
@@ -0,0 +1,22 @@
+import unittest
+from calendar import monthrange, isleap
+
+import pandas as pd
+
+from pandora.core_fields import scaled_calendar, WEEK, DAY_OF_MONTH, DAY_OF_YEAR, DAY_OF_WEEK, SCALED_SUFFIX
+
+
+class CoreFieldsTestCase(unittest.TestCase):
+
+    def test_scaled_calendar(self):
+        dates = pd.Series(pd.date_range('2019-12-25', '2021-01-05'), index=range(100, 478))
+        df = scaled_calendar(dates)
+        self.assertEqual(list(df.index), list(dates.index))
+        for position, date in enumerate(dates):
+            row = df.iloc[position]
+            self.assertAlmostEqual(row[f"{WEEK}{SCALED_SUFFIX}"], date.isocalendar()[1] / 53)
+            self.assertAlmostEqual(row[f"{DAY_OF_MONTH}{SCALED_SUFFIX}"], date.day / monthrange(date.year, date.month)[1])
+            self.assertAlmostEqual(row[f"{DAY_OF_YEAR}{SCALED_SUFFIX}"],
+                                   date.timetuple().tm_yday / (366 if isleap(date.year) else 365))
+            self.assertAlmostEqual(row[f"{DAY_OF_WEEK}{SCALED_SUFFIX}"], date.isoweekday() / 7)
+        self.assertTrue(((df > 0.0) & (df <= 1.0)).all().all())
@@ -2,11 +2,15 @@ import unittest
 from datetime import date
 from logging import basicConfig, INFO
 
+import category_encoders as ce
+import numpy as np
 import pandas as pd
+from scipy.sparse import issparse
+from sklearn.pipeline import FeatureUnion
 
 import pandora.data.population as population
 from pandora.data import geo, country_code
-from pandora import imputer, loader, encoders
+from pandora import loader, encoders
 from pandora.core_fields import COUNTRY_NAME, DAY_OF_WEEK
 
 basicConfig(level=INFO, format='%(asctime)s\t%(levelname)s\t%(filename)s\t%(message)s')
@@ -16,98 +20,118 @@ pd.options.display.max_rows = None
 pd.options.display.max_info_columns = 1000
 
 
+def load(start_date: date, end_date: date) -> pd.DataFrame:
+    return loader.load(start_date, end_date, start_date, end_date, geo.module, [country_code.module, population.module])
+
+
 class EncoderTestCase(unittest.TestCase):
 
     def test_hash_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.HashEncoder(COUNTRY_NAME, 8).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_hash_0", df.columns)
         df.info()
 
     def test_cyclical_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df[DAY_OF_WEEK] = df[DAY_OF_WEEK] / 7.0
         df = encoders.CyclicalEncoder(DAY_OF_WEEK).fit_transform(df)
         self.assertIn(f"{DAY_OF_WEEK}_sin", df.columns)
         self.assertIn(f"{DAY_OF_WEEK}_cos", df.columns)
 
     def test_one_hot_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.OneHotEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_ohe_Germany", df.columns)
         df.info()
 
     def test_binary_encoder(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.BinaryEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_bin_0", df.columns)
 
     def test_sum_encoder(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 12, 31),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 12, 31))
         df = encoders.SumEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_sum_0", df.columns)
 
     def test_backward_difference_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.BackwardDifferenceEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_bde_0", df.columns)
 
     def test_base_n_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.BaseNEncoder(COUNTRY_NAME, 8).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_base_n_0", df.columns)
 
     def test_helmert_contrast_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.HelmertContrastEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_helmert_0", df.columns)
 
     def test_polynomial_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.PolynomialEncoder(COUNTRY_NAME).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_poly_0", df.columns)
 
     def test_bloom_filter_encode(self):
-        df = loader.load(date(2020, 1, 1),
-                         date(2020, 3, 1),
-                         geo,
-                         [country_code, population])
-        df = imputer.impute(df)
+        df = load(date(2020, 1, 1), date(2020, 3, 1))
         df = encoders.BloomFilterEncoder(COUNTRY_NAME, 3, 31).fit_transform(df)
         self.assertIn(f"{COUNTRY_NAME}_bloom_0", df.columns)
+
+    def test_bloom_filter_bits(self):
+        df = pd.DataFrame({COUNTRY_NAME: ['Germany', 'Italy', 'Germany', np.nan]})
+        df_encoded = encoders.BloomFilterEncoder(COUNTRY_NAME, 3, 31).transform(df)
+        self.assertEqual(len(df_encoded.columns), 31)
+        for row, value in enumerate(df[COUNTRY_NAME]):
+            bits = {encoders.BloomFilterEncoder.hash(i, value, 31) for i in range(3)}
+            self.assertEqual(set(df_encoded.columns[df_encoded.iloc[row] == 1]),
+                             {f"{COUNTRY_NAME}_bloom_{bit}" for bit in bits})
+
+    def test_sparse_one_hot_encode(self):
+        df = pd.DataFrame({COUNTRY_NAME: ['Germany', 'Italy', 'Germany', np.nan, 'France']})
+        df_dense = encoders.OneHotEncoder(COUNTRY_NAME).fit_transform(df)
+        df_sparse = encoders.OneHotEncoder(COUNTRY_NAME, sparse=True).fit_transform(df)
+        self.assertIsInstance(df_sparse[f"{COUNTRY_NAME}_ohe_Germany"].dtype, pd.SparseDtype)
+        columns = df_dense.columns[1:]
+        pd.testing.assert_frame_equal(df_sparse[columns].sparse.to_dense(), df_dense[columns])
+
+    def test_sparse_feature_union(self):
+        df = pd.DataFrame({COUNTRY_NAME: ['Germany', 'Italy', 'Germany', 'Spain'], DAY_OF_WEEK: [1, 2, 3, 4]})
+        union = FeatureUnion([
+            ('ohe', encoders.EncoderTransformer(encoders.OneHotEncoder(COUNTRY_NAME, sparse=True))),
+            ('hash', encoders.EncoderTransformer(encoders.HashEncoder(COUNTRY_NAME, 8, sparse=True)))
+        ])
+        matrix = union.fit_transform(df)
+        self.assertTrue(issparse(matrix))
+        self.assertEqual(matrix.shape, (4, 11))
+        self.assertEqual(matrix[:, :3].sum(), 4)
+
+    def test_matches_category_encoders(self):
+        # the encoders are fit on the distinct values, and must encode like category_encoders fit on every row,
+        # including values unseen while fitting and missing values
+        df_fit = pd.DataFrame({COUNTRY_NAME: ['Germany', 'Italy', 'Germany', 'Spain', np.nan, 'Italy', 'France']})
+        df = pd.DataFrame({COUNTRY_NAME: ['Italy', 'Portugal', np.nan, 'Germany', 'Greece', 'France', 'Spain']})
+        for encoder, internal_encoder in [
+            (encoders.BinaryEncoder(COUNTRY_NAME), ce.BinaryEncoder(cols=[COUNTRY_NAME])),
+            (encoders.SumEncoder(COUNTRY_NAME), ce.SumEncoder(cols=[COUNTRY_NAME])),
+            (encoders.HelmertContrastEncoder(COUNTRY_NAME), ce.HelmertEncoder(cols=[COUNTRY_NAME])),
+            (encoders.HashEncoder(COUNTRY_NAME, 8), ce.HashingEncoder(cols=[COUNTRY_NAME], n_components=8)),
+            (encoders.OneHotEncoder(COUNTRY_NAME), ce.OneHotEncoder(cols=[COUNTRY_NAME], use_cat_names=True)),
+            (encoders.BackwardDifferenceEncoder(COUNTRY_NAME), ce.BackwardDifferenceEncoder(cols=[COUNTRY_NAME])),
+            (encoders.BaseNEncoder(COUNTRY_NAME), ce.BaseNEncoder(cols=[COUNTRY_NAME])),
+            (encoders.PolynomialEncoder(COUNTRY_NAME), ce.PolynomialEncoder(cols=[COUNTRY_NAME]))
+        ]:
+            expected = internal_encoder.fit(df_fit).transform(df).drop(columns=['intercept'], errors='ignore')
+            df_encoded = encoder.fit(df_fit).transform_columns(df)
+            self.assertEqual(len(df_encoded.columns), len(expected.columns))
+            np.testing.assert_allclose(df_encoded.to_numpy(dtype='float64'), expected.to_numpy(dtype='float64'))
+
+    def test_hash_encode_missing_values(self):
+        # None is a missing value like NaN, and gets the vector of NaN, whereas category_encoders hashes None apart
+        df = pd.DataFrame({COUNTRY_NAME: ['Germany', None, np.nan]}, dtype=object)
+        df_encoded = encoders.HashEncoder(COUNTRY_NAME, 8).fit(df).transform_columns(df)
+        expected = ce.HashingEncoder(cols=[COUNTRY_NAME], n_components=8).fit(df).transform(df.iloc[[2]])
+        np.testing.assert_array_equal(df_encoded.iloc[1].to_numpy(), df_encoded.iloc[2].to_numpy())
+        np.testing.assert_array_equal(df_encoded.iloc[2].to_numpy(), expected.iloc[0].to_numpy())
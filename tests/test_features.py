@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterGrid
+
+from pandora.core_fields import GEO_CODE, DATE
+from pandora.features import Feature, FeatureTransformer, add_features, LAG, LEAD, DIFF, MEAN
+
+CASES = 'cases'
+NEW_CASES = 'new_cases'
+
+
+def sample() -> pd.DataFrame:
+    # three geos with 30 days each, shuffled, with missing values at the edges and inside
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({GEO_CODE: np.repeat(['DE', 'IT', 'US/Texas'], 30),
+                       DATE: np.tile(pd.date_range('2020-03-01', periods=30), 3),
+                       CASES: np.cumsum(rng.integers(0, 50, 90)).astype('float64')})
+    df.loc[[0, 1, 15, 59, 70], CASES] = np.nan
+    df[GEO_CODE] = df[GEO_CODE].astype('category')
+    return df.sample(frac=1.0, random_state=3)
+
+
+def expected(group: pd.DataFrame) -> pd.DataFrame:
+    # the per geo computations the features replace
+    group = group.sort_values(DATE)
+    group[NEW_CASES] = group[CASES].diff(-1).fillna(0.0).apply(lambda x: max(0, -x))
+    group[f"{NEW_CASES}_ma"] = group[NEW_CASES].shift(1).bfill().ffill().rolling(7, min_periods=1).mean().bfill().ffill()
+    group[f"{CASES}_ma"] = group[CASES].shift(1).bfill().ffill().rolling(3, min_periods=1).mean().bfill().ffill()
+    group[f"{CASES}_tomorrow"] = group[CASES].shift(-1).bfill().ffill()
+    group[f"{CASES}_yesterday"] = group[CASES].shift(1).bfill().ffill()
+    return group
+
+
+FEATURES = [
+    Feature(CASES, DIFF, shift=-1, name=NEW_CASES, minimum=0.0),
+    Feature(NEW_CASES, MEAN, window=7, shift=1, name=f"{NEW_CASES}_ma"),
+    Feature(CASES, MEAN, window=3, shift=1, name=f"{CASES}_ma"),
+    Feature(CASES, LEAD, shift=1, name=f"{CASES}_tomorrow"),
+    Feature(CASES, LAG, shift=1, name=f"{CASES}_yesterday"),
+]
+
+
+class FeaturesTestCase(unittest.TestCase):
+
+    def test_add_features(self):
+        df = sample()
+        df_actual = add_features(df, FEATURES)
+        df_expected = df.groupby(GEO_CODE, group_keys=False).apply(expected).loc[df.index]
+        self.assertEqual(list(df_actual.index), list(df.index))
+        pd.testing.assert_frame_equal(df_actual, df_expected, check_dtype=False)
+
+    def test_default_names(self):
+        self.assertEqual(Feature(CASES, MEAN, window=7).name, 'cases_mean_7')
+        self.assertEqual(Feature(CASES, LAG, shift=2).name, 'cases_lag_2')
+        with self.assertRaises(ValueError):
+            Feature(CASES, 'median')
+
+    def test_transformer_windows(self):
+        df = sample()
+        transformer = FeatureTransformer(FEATURES)
+        for parameters in ParameterGrid({'windows': [None, {f"{CASES}_ma": 5}]}):
+            transformer.set_params(**parameters)
+            df_actual = transformer.fit_transform(df)
+            window = (parameters['windows'] or {}).get(f"{CASES}_ma", 3)
+            df_expected = df.sort_values([GEO_CODE, DATE]).groupby(GEO_CODE, group_keys=False)[CASES].apply(
+                lambda s: s.shift(1).bfill().ffill().rolling(window, min_periods=1).mean())
+            pd.testing.assert_series_equal(df_actual[f"{CASES}_ma"], df_expected.loc[df.index], check_names=False)
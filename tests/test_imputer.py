@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pandora import imputer
+from pandora.core_fields import COUNTRY_NAME, YEAR, DATE
+from pandora.core_types import Module, Imputation
+from pandora.imputers import impute_with_mean, impute_with_max, impute_with_median, impute_with_forward_fill, \
+    impute_with_zero
+
+VALUE_A = 'value_a'
+VALUE_B = 'value_b'
+
+STRATEGY = [
+    Imputation(impute_with_mean, [YEAR, COUNTRY_NAME]),
+    Imputation(impute_with_max, [COUNTRY_NAME]),
+    Imputation(impute_with_mean, [YEAR]),
+    Imputation(impute_with_mean, [])
+]
+
+
+def sample() -> pd.DataFrame:
+    return pd.DataFrame({COUNTRY_NAME: ['A', 'A', 'A', 'B', 'B', 'C', 'C', 'D'],
+                         YEAR: [2019, 2020, 2020, 2019, 2020, 2019, 2019, 2020],
+                         DATE: pd.date_range('2020-01-01', periods=8),
+                         VALUE_A: [1.0, np.nan, 3.0, np.nan, 5.0, np.nan, np.nan, np.nan],
+                         VALUE_B: [np.nan, 2.0, np.nan, 4.0, np.nan, 6.0, np.nan, np.nan]})
+
+
+def impute_sequentially(df: pd.DataFrame, module: Module) -> pd.DataFrame:
+    for name, imputations in module.imputations.items():
+        for imputation in imputations:
+            if df[name].isna().any():
+                df = imputer.impute_feature_by_series(df, name, imputation)
+    return df
+
+
+class ImputerTestCase(unittest.TestCase):
+
+    def test_grouped_imputation_matches_sequential(self):
+        module = Module('sample', {VALUE_A: STRATEGY, VALUE_B: STRATEGY})
+        pd.testing.assert_frame_equal(imputer.impute(sample(), module), impute_sequentially(sample(), module))
+
+    def test_plan_with_constant_fallback(self):
+        strategy = [Imputation(impute_with_mean, [COUNTRY_NAME]), Imputation(impute_with_zero, [])]
+        module = Module('sample', {VALUE_A: strategy, VALUE_B: strategy})
+        self.assertIsNotNone(imputer.compile_plan(strategy))
+        df = imputer.impute(sample(), module)
+        self.assertEqual(df[VALUE_A].tolist(), [1.0, 2.0, 3.0, 5.0, 5.0, 0.0, 0.0, 0.0])
+        pd.testing.assert_frame_equal(df, impute_sequentially(sample(), module))
+
+    def test_grouped_forward_fill(self):
+        module = Module('sample', {VALUE_A: [Imputation(impute_with_forward_fill, [COUNTRY_NAME])],
+                                   VALUE_B: [Imputation(impute_with_forward_fill, [COUNTRY_NAME]),
+                                             Imputation(impute_with_zero, [])]})
+        df = imputer.impute(sample(), module)
+        self.assertEqual(df[VALUE_A].tolist(), [1.0, 1.0, 3.0, 0.0, 5.0, 0.0, 0.0, 0.0])
+        pd.testing.assert_frame_equal(df, impute_sequentially(sample(), module))
+
+    def test_global_statistics(self):
+        # the global levels of a subset of the countries fill the values recorded over every country
+        median_strategy = [Imputation(impute_with_median, [COUNTRY_NAME]), Imputation(impute_with_median, [YEAR])]
+        module = Module('sample', {VALUE_A: STRATEGY, VALUE_B: median_strategy})
+        statistics = imputer.GlobalStatistics()
+        df_full = imputer.impute(sample(), module, statistics)
+        self.assertFalse(statistics.frozen)
+        self.assertIsNotNone(statistics.get('sample', VALUE_A, 2))
+        self.assertIsNone(statistics.get('sample', VALUE_A, 1))
+        subset = sample()[COUNTRY_NAME].isin(['C', 'D'])
+        df = imputer.impute(sample()[subset], module, statistics.freeze())
+        pd.testing.assert_frame_equal(df, df_full[subset])
+        self.assertNotEqual(imputer.impute(sample()[subset], module)[VALUE_A].tolist(), df[VALUE_A].tolist())
+
+    def test_weighted_rows(self):
+        # a row with a weight imputes the same values as that many identical rows
+        module = Module('sample', {VALUE_A: STRATEGY, VALUE_B: STRATEGY})
+        weights = np.array([1, 3, 2, 1, 4, 2, 1, 5])
+        df = imputer.impute(sample(), module, weights=weights)
+        df_repeated = imputer.impute(sample().loc[np.repeat(np.arange(8), weights)], module)
+        pd.testing.assert_frame_equal(df, df_repeated.drop_duplicates())
+        module = Module('sample', {VALUE_A: [Imputation(impute_with_forward_fill, [COUNTRY_NAME])]})
+        with self.assertRaises(ValueError):
+            imputer.impute(sample(), module, weights=weights)
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from datetime import date
 from logging import basicConfig, INFO
@@ -9,8 +11,9 @@ import pandora.data.oxford_data as oxford
 import pandora.data.population as population
 import pandora.data.temperatures as temperatures
 from pandora.data import geo, continent, country_code, working_day
-from pandora import loader
-from pandora.core_fields import DATE, COUNTRY_CODE
+from pandora import loader, partitions
+from pandora.core_fields import DATE, COUNTRY_CODE, YEAR, DAY_OF_WEEK, GEO_CODE, REGION_NAME
+from pandora.core_types import Module
 
 basicConfig(level=INFO, format='%(asctime)s\t%(levelname)s\t%(filename)s\t%(message)s')
 
@@ -104,3 +107,109 @@ class LoaderTestCase(unittest.TestCase):
         # verify the date merging worked properly, for the given date range
         self.assertEqual(df[DATE].min(), start_date)
         self.assertEqual(df[DATE].max(), end_date)
+
+    def test_expand_with_calendar_keys(self):
+        expansion_window = pd.date_range(date(2019, 12, 30), date(2020, 1, 5), freq='D')
+        df = pd.DataFrame({COUNTRY_CODE: ['DE', 'IT'], YEAR: [2019, 2020], DAY_OF_WEEK: [1, 7]})
+        df = loader.expand(df, expansion_window)
+        self.assertEqual(df[DATE].tolist(), [pd.Timestamp(2019, 12, 30), pd.Timestamp(2020, 1, 5)])
+        self.assertEqual(df[COUNTRY_CODE].tolist(), ['DE', 'IT'])
+
+    def test_cached_load(self):
+        with tempfile.TemporaryDirectory() as cache_location:
+            loads = [loader.load(date(2020, 1, 10),
+                                 date(2020, 1, 11),
+                                 date(2020, 1, 1),
+                                 date(2020, 1, 8),
+                                 geo.module,
+                                 [
+                                     country_code.module,
+                                     population.module,
+                                     working_day.module
+                                 ],
+                                 cache_location=cache_location) for _ in range(2)]
+            self.assertEqual(len(os.listdir(cache_location)), 4)
+        pd.testing.assert_frame_equal(loads[0], loads[1])
+
+    def test_cached_load_with_changed_schema(self):
+        dates = (date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 8))
+        module = Module(population.module.location,
+                        population.module.imputations,
+                        population.module.mark_missing,
+                        {**population.module.schema, population.POPULATION_DENSITY: 'float64'})
+        with tempfile.TemporaryDirectory() as cache_location:
+            loader.load(*dates, geo.module, [country_code.module, population.module], cache_location=cache_location)
+            df = loader.load(*dates, geo.module, [country_code.module, module], cache_location=cache_location)
+        self.assertEqual(df[population.POPULATION_DENSITY].dtype, 'float64')
+
+    def test_parallel_load(self):
+        loads = [loader.load(date(2020, 1, 10),
+                             date(2020, 1, 11),
+                             date(2020, 1, 1),
+                             date(2020, 1, 8),
+                             geo.module,
+                             [
+                                 country_code.module,
+                                 continent.module,
+                                 population.module,
+                                 working_day.module
+                             ],
+                             workers=workers) for workers in [1, 4]]
+        pd.testing.assert_frame_equal(loads[0], loads[1])
+
+    def test_partitioned_read(self):
+        expansion_window = pd.date_range(date(2020, 1, 30), date(2020, 2, 2))
+        paths = partitions.list_partitions(working_day.module.location, expansion_window[0], expansion_window[-1])
+        self.assertEqual([path.name for path in paths], ['2020-01.csv', '2020-02.csv'])
+        df = loader.read_module(working_day.module, expansion_window)
+        self.assertEqual(df[DATE].min(), expansion_window[0])
+        self.assertEqual(df[DATE].max(), expansion_window[-1])
+        self.assertEqual(len(df.index), 4 * df[COUNTRY_CODE].nunique())
+        df = loader.read_module(working_day.module, pd.date_range(date(2030, 1, 1), date(2030, 1, 2)))
+        self.assertTrue(df.empty)
+        self.assertIn(working_day.WORKING_DAY, df.columns)
+
+    def test_projected_load(self):
+        dates = (date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 8))
+        modules = [country_code.module, continent.module, population.module, age_dist.module, working_day.module]
+        columns = [population.POPULATION_DENSITY, working_day.WORKING_DAY, f"{working_day.WORKING_DAY}--"]
+        df = loader.load(*dates, geo.module, modules, columns=columns)
+        self.assertEqual(list(df.columns), [DATE, GEO_CODE] + sorted(columns))
+        df_full = loader.load(*dates, geo.module, modules)
+        pd.testing.assert_frame_equal(df.sort_values([DATE, GEO_CODE], ignore_index=True),
+                                      df_full[df.columns].sort_values([DATE, GEO_CODE], ignore_index=True))
+        with self.assertRaises(ValueError):
+            loader.load(*dates, geo.module, modules, columns=['unknown'])
+
+    def test_geo_filtered_load(self):
+        dates = (date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 8))
+        modules = [country_code.module, continent.module, population.module, age_dist.module, working_day.module]
+        df_full = loader.load(*dates, geo.module, modules)
+        statistics = loader.global_statistics(*dates, geo.module, modules)
+        # GE has no obesity rate, which is imputed by the global levels
+        for geos in [['GE'], ['DE', 'US/Texas'], ['US']]:
+            df = loader.load(*dates, geo.module, modules, geos=geos, statistics=statistics)
+            df_expected = df_full[df_full[GEO_CODE].isin(geos) | df_full[COUNTRY_CODE].isin(geos)]
+            pd.testing.assert_frame_equal(df.sort_values([DATE, GEO_CODE], ignore_index=True),
+                                          df_expected.sort_values([DATE, GEO_CODE], ignore_index=True),
+                                          check_categorical=False)
+        df = loader.load(*dates, geo.module, modules, geos=['US'], statistics=statistics)
+        self.assertEqual(set(df[COUNTRY_CODE]), {'US'})
+        self.assertIn('', set(df[REGION_NAME]))
+        self.assertGreater(df[REGION_NAME].nunique(), 1)
+
+    def test_dimension_load(self):
+        expansion_window = pd.date_range(date(2019, 6, 1), date(2020, 6, 30))
+        df = loader.load_module(geo.module, expansion_window)
+        columns = {name: df[name] for name in df.columns}
+        for module in [country_code.module, continent.module, population.module, age_dist.module]:
+            df_dimension = loader.load_module(module, expansion_window, dimension=True)
+            self.assertNotIn(DATE, df_dimension.columns)
+            aligned = loader.align_module(columns, module, df_dimension)
+            expected = loader.align_module(columns, module, loader.load_module(module, expansion_window))
+            self.assertEqual(list(aligned), list(expected))
+            for name in expected:
+                pd.testing.assert_series_equal(aligned[name], expected[name])
+            columns.update(aligned)
+        # imputed with medians by date
+        self.assertIn(DATE, loader.load_module(working_day.module, expansion_window, dimension=True).columns)
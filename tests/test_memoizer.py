@@ -0,0 +1,69 @@
+import unittest
+from datetime import date
+from logging import basicConfig, INFO
+
+import pandas as pd
+
+from pandora.data import geo, country_code, working_day
+from pandora.memoizer import MemoizingLoader
+from pandora import loader
+from pandora.core_fields import DATE
+
+basicConfig(level=INFO, format='%(asctime)s\t%(levelname)s\t%(filename)s\t%(message)s')
+
+MODULES = [country_code.module, working_day.module]
+
+
+class MemoizingLoaderTestCase(unittest.TestCase):
+
+    def test_sliding_window_is_sliced_from_cache(self):
+        memoizing_loader = MemoizingLoader()
+        for day in range(10, 14):
+            df = memoizing_loader.load(date(2020, 1, day),
+                                       date(2020, 1, day + 1),
+                                       date(2020, 1, 1),
+                                       date(2020, 1, 31),
+                                       geo.module,
+                                       MODULES)
+            self.assertEqual(df[DATE].min(), pd.Timestamp(2020, 1, day))
+            self.assertEqual(df[DATE].max(), pd.Timestamp(2020, 1, day + 1))
+        self.assertEqual(memoizing_loader.misses, 1)
+        self.assertEqual(memoizing_loader.hits, 3)
+        expected = loader.load(date(2020, 1, 13), date(2020, 1, 14), date(2020, 1, 1), date(2020, 1, 31),
+                               geo.module, MODULES)
+        pd.testing.assert_frame_equal(df, expected)
+
+    def test_eviction(self):
+        memoizing_loader = MemoizingLoader()
+        memoizing_loader.load(date(2020, 1, 1), date(2020, 1, 2), date(2020, 1, 1), date(2020, 1, 8),
+                              geo.module, MODULES)
+        memoizing_loader = MemoizingLoader(max_bytes=memoizing_loader.bytes)
+        memoizing_loader.load(date(2020, 1, 1), date(2020, 1, 2), date(2020, 1, 1), date(2020, 1, 8),
+                              geo.module, MODULES)
+        memoizing_loader.load(date(2020, 1, 2), date(2020, 1, 3), date(2020, 1, 2), date(2020, 1, 9),
+                              geo.module, MODULES)
+        self.assertEqual(memoizing_loader.misses, 2)
+        self.assertEqual(memoizing_loader.evictions, 1)
+        self.assertLessEqual(memoizing_loader.bytes, memoizing_loader.max_bytes)
+
+    def test_load_options(self):
+        memoizing_loader = MemoizingLoader()
+        dates = (date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 31))
+        options = dict(columns=[working_day.WORKING_DAY], geos=['DE', 'US'])
+        for _ in range(2):
+            df = memoizing_loader.load(*dates, geo.module, MODULES, **options)
+        pd.testing.assert_frame_equal(df, loader.load(*dates, geo.module, MODULES, **options))
+        memoizing_loader.load(*dates, geo.module, MODULES, geos=['DE', 'US'])
+        self.assertEqual(memoizing_loader.misses, 2)
+        self.assertEqual(memoizing_loader.hits, 1)
+
+    def test_enclosing_window(self):
+        for reuse_enclosing_windows, misses in [(False, 2), (True, 1)]:
+            memoizing_loader = MemoizingLoader(reuse_enclosing_windows=reuse_enclosing_windows)
+            memoizing_loader.load(date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 31),
+                                  geo.module, MODULES)
+            df = memoizing_loader.load(date(2020, 1, 12), date(2020, 1, 13), date(2020, 1, 5), date(2020, 1, 20),
+                                       geo.module, MODULES)
+            self.assertEqual(memoizing_loader.misses, misses)
+            self.assertEqual(df[DATE].min(), pd.Timestamp(2020, 1, 12))
+            self.assertEqual(df[DATE].max(), pd.Timestamp(2020, 1, 13))
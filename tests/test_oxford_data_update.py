@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import pandas as pd
+
+from pandora import loader, partitions
+from pandora.core_fields import DATE, COUNTRY_NAME, REGION_NAME
+from pandora.core_types import Module
+from pandora.data import geo, country_code, oxford_data
+from pandora.data.oxford_data import C1, H6, CONFIRMED_CASES
+from pandora.data.oxford_data_update import update_incremental
+
+
+def write_source(path: str, rows: [tuple]) -> None:
+    # a local file in the format of the OxCGRT data set, standing in for the remote location
+    pd.DataFrame(rows, columns=['CountryName', 'CountryCode', 'RegionName', 'Date', 'C1_School closing',
+                                'H6_Facial Coverings', 'ConfirmedCases', 'StringencyIndex']).to_csv(path, index=False)
+
+
+class OxfordDataUpdateTestCase(unittest.TestCase):
+
+    def test_update_incremental(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'OxCGRT_latest.csv')
+            location = os.path.join(directory, 'oxford_data')
+            write_source(source, [('Germany', 'DEU', '', 20200130, 1, 0, 5, 11.1),
+                                  ('Germany', 'DEU', '', 20200131, None, 1, 7, 11.1),
+                                  ('Italy', 'ITA', '', 20200131, 2, None, 3, 20.0)])
+            self.assertEqual(update_incremental(source, location), 3)
+            write_source(source, [('Germany', 'DEU', '', 20200130, 1, 0, 5, 11.1),
+                                  ('Germany', 'DEU', '', 20200131, None, 1, 7, 11.1),
+                                  ('Germany', 'DEU', '', 20200201, None, None, None, 11.1),
+                                  ('Italy', 'ITA', '', 20200131, 2, None, 3, 20.0),
+                                  ('Italy', 'ITA', '', 20200201, None, 2, 4, 20.0)])
+            self.assertEqual(update_incremental(source, location), 2)
+            self.assertEqual(update_incremental(source, location), 0)
+            self.assertEqual([path.name for path in partitions.list_partitions(location)],
+                             ['2020-01.csv', '2020-02.csv'])
+
+            df = partitions.read(location, keep_default_na=False, na_values='')
+            df = df.sort_values([COUNTRY_NAME, DATE], ignore_index=True)
+            self.assertEqual(list(df[DATE]), ['2020-01-30', '2020-01-31', '2020-02-01', '2020-01-31', '2020-02-01'])
+            # the npi values are forward filled across updates, the other measures are stored as reported
+            self.assertEqual(list(df[C1]), [1, 1, 1, 2, 2])
+            self.assertEqual(list(df[H6].fillna(-1)), [0, 1, 1, -1, 2])
+            self.assertEqual(list(df[CONFIRMED_CASES].fillna(-1)), [5, 7, -1, 3, 4])
+            self.assertTrue(df[REGION_NAME].isna().all())
+
+            module = Module(location, oxford_data.module.imputations, oxford_data.module.mark_missing,
+                            oxford_data.module.schema)
+            df = loader.load(date(2020, 2, 1), date(2020, 2, 1), date(2020, 1, 30), date(2020, 2, 1),
+                             geo.module, [country_code.module, module])
+            df = df.set_index(COUNTRY_NAME)
+            self.assertEqual(df.loc['Germany', C1], 1)
+            self.assertEqual(df.loc['Italy', H6], 2)
+            self.assertFalse(df[[C1, H6]].isna().any().any())
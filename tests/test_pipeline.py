@@ -1,14 +1,12 @@
+import os
+import tempfile
 import unittest
 from datetime import date
 from logging import INFO, basicConfig, info
 
 import pandas as pd
-from category_encoders import BinaryEncoder
-from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.linear_model import SGDRegressor
 from sklearn.model_selection import GridSearchCV
-from sklearn.pipeline import Pipeline, FeatureUnion
-from sklearn.preprocessing import StandardScaler
 
 from pandora.data import country_code, geo, continent, age_distribution, population, temperatures, oxford_data, \
     working_day
@@ -22,6 +20,8 @@ from pandora.data.population import POPULATION, POPULATION_DENSITY, OBESITY_RATE
 from pandora.data.temperatures import SPECIFIC_HUMIDITY, TEMPERATURE
 from pandora.data.working_day import WORKING_DAY
 from pandora import loader
+from pandora.training import to_matrix, build_pipeline, numeric, nominal
+from pandora.features import Feature, add_features, DIFF, MEAN, LEAD, LAG
 from pandora.core_fields import COUNTRY_CODE, DATE, DAY_OF_WEEK, DAY_OF_YEAR, GEO_CODE
 
 basicConfig(level=INFO, format='%(asctime)s\t%(levelname)s\t%(filename)s\t%(message)s')
@@ -35,6 +35,27 @@ import warnings
 warnings.filterwarnings('ignore', category=FutureWarning)  # ignore FutureWarning from scikit learn
 
 PREDICTED_NEW_CASES = 'new_cases'
+SUFFIX_MA_A = '_MA_A'
+SUFFIX_MA_B = '_MA_B'
+SUFFIX_MA_C = '_MA_C'
+
+
+def moving_averages(name: str) -> [Feature]:
+    # shift by 1 so we look only at past days
+    # NOTE: the shift is also important so we don't include today's predicted data in the value
+    return [Feature(name, MEAN, window=3, shift=1, name=name + SUFFIX_MA_A),
+            Feature(name, MEAN, window=7, shift=1, name=name + SUFFIX_MA_B),
+            Feature(name, MEAN, window=21, shift=1, name=name + SUFFIX_MA_C)]
+
+
+FEATURES = [
+    # the label: the new cases of the next day
+    Feature(CONFIRMED_CASES, DIFF, shift=-1, name=PREDICTED_NEW_CASES, minimum=0.0),
+    *moving_averages(PREDICTED_NEW_CASES),
+    *moving_averages(CONFIRMED_CASES),
+    Feature(WORKING_DAY, LEAD, shift=1, name=WORKING_DAY + '_tomorrow'),
+    Feature(WORKING_DAY, LAG, shift=1, name=WORKING_DAY + '_yesterday')
+]
 
 
 class PipelineTestCase(unittest.TestCase):
@@ -62,89 +83,94 @@ class PipelineTestCase(unittest.TestCase):
 
         # derive the label columns, and move new cases to the front
         info('calculating label')
-        df = df.groupby(GEO_CODE).apply(self.determine_new_cases).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_a(group, PREDICTED_NEW_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_b(group, PREDICTED_NEW_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_c(group, PREDICTED_NEW_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_a(group, CONFIRMED_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_b(group, CONFIRMED_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: group_add_ma_c(group, CONFIRMED_CASES)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: add_working_day_tomorrow(group)).reset_index(drop=True)
-        df = df.groupby(GEO_CODE).apply(lambda group: add_working_day_yesterday(group)).reset_index(drop=True)
+        df = add_features(df, FEATURES)
 
         # move the label to the front
         df = transform_column_order(df)
 
+        # convert the frame once to a memory mapped matrix shared by the grid search workers. the rows are ordered by
+        # date, so each split is a slice of the rows
+        info('converting to a feature matrix')
+        df = df.sort_values(DATE, kind='mergesort', ignore_index=True)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        matrix = to_matrix(df, os.path.join(directory.name, 'features.npy'))
+
         # create the pipeline
         info('creating pipeline')
-        pipeline = Pipeline([
-            ('features', FeatureUnion([
-                # geographic location
-                nominal(CONTINENT),
-                nominal(COUNTRY_CODE),
-                # it is important to have the geo code, to help distinguish from different countries with no regions,
-                # otherwise, if we only use a region code, all countries have the same 0 value. This way, we do not
-                # need to rely on the algorithm determining this from the combo of country + region. we make it explicit
-                nominal(GEO_CODE),
-                # case information
-                numeric(PREDICTED_NEW_CASES + SUFFIX_MA_A),
-                numeric(PREDICTED_NEW_CASES + SUFFIX_MA_B),
-                numeric(PREDICTED_NEW_CASES + SUFFIX_MA_C),
-                numeric(CONFIRMED_CASES),
-                numeric(CONFIRMED_CASES + SUFFIX_MA_A),
-                numeric(CONFIRMED_CASES + SUFFIX_MA_B),
-                numeric(CONFIRMED_CASES + SUFFIX_MA_C),
-                # non-pharmaceutical interventions
-                numeric(C1),
-                numeric(C2),
-                numeric(C3),
-                numeric(C4),
-                numeric(C5),
-                numeric(C6),
-                numeric(C7),
-                numeric(C8),
-                numeric(H1),
-                numeric(H2),
-                numeric(H3),
-                numeric(H6),
-                # country and regional information
-                numeric(AGE_DISTRIBUTION_1),
-                numeric(AGE_DISTRIBUTION_2),
-                numeric(AGE_DISTRIBUTION_3),
-                numeric(AGE_DISTRIBUTION_4),
-                numeric(AGE_DISTRIBUTION_5),
-                numeric(GDP_PER_CAPITA),
-                numeric(OBESITY_RATE),
-                numeric(POPULATION),
-                numeric(POPULATION_DENSITY),
-                numeric(POPULATION_PERCENT_URBAN),
-                numeric(PNEUMONIA_DEATHS_PER_100K),
-                numeric(SPECIFIC_HUMIDITY),
-                numeric(TEMPERATURE),
-                numeric(WORKING_DAY),
-                numeric(WORKING_DAY + '_tomorrow'),
-                numeric(WORKING_DAY + '_yesterday'),
-                # date/time fields
-                # numeric(DATE),
-                # numeric(DAY_OF_MONTH),
-                nominal(DAY_OF_WEEK),
-                numeric(DAY_OF_YEAR),
-                # numeric(WEEK),
-                # numeric(MONTH),
-                # numeric(QUARTER),
-                # numeric(YEAR)
-            ])),
-            ('estimator', SGDRegressor(max_iter=10000,
-                                       early_stopping=True,
-                                       n_iter_no_change=2000,
-                                       shuffle=True))
-        ])
+        pipeline = build_pipeline([
+            # geographic location
+            nominal(matrix, CONTINENT),
+            nominal(matrix, COUNTRY_CODE),
+            # it is important to have the geo code, to help distinguish from different countries with no regions,
+            # otherwise, if we only use a region code, all countries have the same 0 value. This way, we do not
+            # need to rely on the algorithm determining this from the combo of country + region. we make it explicit
+            nominal(matrix, GEO_CODE),
+            # case information
+            numeric(matrix, PREDICTED_NEW_CASES + SUFFIX_MA_A),
+            numeric(matrix, PREDICTED_NEW_CASES + SUFFIX_MA_B),
+            numeric(matrix, PREDICTED_NEW_CASES + SUFFIX_MA_C),
+            numeric(matrix, CONFIRMED_CASES),
+            numeric(matrix, CONFIRMED_CASES + SUFFIX_MA_A),
+            numeric(matrix, CONFIRMED_CASES + SUFFIX_MA_B),
+            numeric(matrix, CONFIRMED_CASES + SUFFIX_MA_C),
+            # non-pharmaceutical interventions
+            numeric(matrix, C1),
+            numeric(matrix, C2),
+            numeric(matrix, C3),
+            numeric(matrix, C4),
+            numeric(matrix, C5),
+            numeric(matrix, C6),
+            numeric(matrix, C7),
+            numeric(matrix, C8),
+            numeric(matrix, H1),
+            numeric(matrix, H2),
+            numeric(matrix, H3),
+            numeric(matrix, H6),
+            # country and regional information
+            numeric(matrix, AGE_DISTRIBUTION_1),
+            numeric(matrix, AGE_DISTRIBUTION_2),
+            numeric(matrix, AGE_DISTRIBUTION_3),
+            numeric(matrix, AGE_DISTRIBUTION_4),
+            numeric(matrix, AGE_DISTRIBUTION_5),
+            numeric(matrix, GDP_PER_CAPITA),
+            numeric(matrix, OBESITY_RATE),
+            numeric(matrix, POPULATION),
+            numeric(matrix, POPULATION_DENSITY),
+            numeric(matrix, POPULATION_PERCENT_URBAN),
+            numeric(matrix, PNEUMONIA_DEATHS_PER_100K),
+            numeric(matrix, SPECIFIC_HUMIDITY),
+            numeric(matrix, TEMPERATURE),
+            numeric(matrix, WORKING_DAY),
+            numeric(matrix, WORKING_DAY + '_tomorrow'),
+            numeric(matrix, WORKING_DAY + '_yesterday'),
+            # date/time fields
+            # numeric(matrix, DATE),
+            # numeric(matrix, DAY_OF_MONTH),
+            nominal(matrix, DAY_OF_WEEK),
+            numeric(matrix, DAY_OF_YEAR),
+            # numeric(matrix, WEEK),
+            # numeric(matrix, MONTH),
+            # numeric(matrix, QUARTER),
+            # numeric(matrix, YEAR)
+        ],
+            SGDRegressor(max_iter=10000,
+                         early_stopping=True,
+                         n_iter_no_change=2000,
+                         shuffle=True),
+            # the features are fit once per fold, and reused by all the candidates
+            memory=os.path.join(directory.name, 'memory'))
 
         info('getting train/val/test split')
         train, val, test = split(df, 30, 1)
-        train_x, train_y, validation_x, validation_y, test_x, test_y = (train.iloc[:, 1:], train.iloc[:, :1],
-                                                                        val.iloc[:, 1:], val.iloc[:, :1],
-                                                                        test.iloc[:, 1:], test.iloc[:, :1])
+        validation_start = len(train.index)
+        test_start = validation_start + len(val.index)
+        train_x, validation_x, test_x = (matrix.rows(0, validation_start),
+                                         matrix.rows(validation_start, test_start),
+                                         matrix.rows(test_start))
+        label = matrix.index(PREDICTED_NEW_CASES)
+        train_y, validation_y, test_y = train_x[:, label], validation_x[:, label], test_x[:, label]
+        self.assertEqual(len(test_y), len(test.index))
 
         # split our dataset
         """
@@ -166,38 +192,12 @@ class PipelineTestCase(unittest.TestCase):
                             scoring='neg_root_mean_squared_error',
                             n_jobs=10,
                             verbose=10)
-        grid.fit(train_x, train_y.values.ravel())
-        print("score A = %3.2f" % (grid.score(validation_x, validation_y.values.ravel())))
-        print("score C = %3.2f" % (grid.best_estimator_.score(validation_x, validation_y.values.ravel())))
+        grid.fit(train_x, train_y)
+        print("score A = %3.2f" % (grid.score(validation_x, validation_y)))
+        print("score C = %3.2f" % (grid.best_estimator_.score(validation_x, validation_y)))
         print(grid.best_score_)
         print(grid.best_params_)
 
-    @staticmethod
-    def determine_new_cases(grouped):
-        grouped[PREDICTED_NEW_CASES] = grouped[CONFIRMED_CASES].copy()
-        grouped[PREDICTED_NEW_CASES] = grouped[PREDICTED_NEW_CASES].diff(-1).fillna(0.0).apply(lambda x: max(0, -x))
-        return grouped
-
-    @staticmethod
-    def determine_moving_averages(grouped):
-        grouped[PREDICTED_NEW_CASES] = grouped[CONFIRMED_CASES].copy()
-        grouped[PREDICTED_NEW_CASES] = grouped[PREDICTED_NEW_CASES].diff(-1).fillna(0.0).apply(lambda x: max(0, -x))
-        return grouped
-
-
-def numeric(name: str):
-    return (name, Pipeline([
-        (name + '.select', DataFrameSelector([name])),
-        (name + '.scale', StandardScaler())
-    ]))
-
-
-def nominal(name: str):
-    return (name, Pipeline([
-        (name + '.select', DataFrameSelector([name])),
-        (name + '.scale', BinaryEncoder())
-    ]))
-
 
 def split(df: pd.DataFrame, days_for_validation: int, days_for_test: int) -> (pd.DataFrame, pd.DataFrame, pd.DataFrame):
     # First, sort the data by date
@@ -229,53 +229,3 @@ def transform_column_order(df: pd.DataFrame) -> pd.DataFrame:
     df = df.drop(labels=[PREDICTED_NEW_CASES], axis=1)
     df.insert(0, PREDICTED_NEW_CASES, df_label)
     return df
-
-
-class DataFrameSelector(BaseEstimator, TransformerMixin):
-    def __init__(self, attribute_names):
-        self.attribute_names = attribute_names
-
-    def fit(self, x, y=None):
-        return self
-
-    def transform(self, x):
-        return x[self.attribute_names]
-
-
-MA_WINDOW_A = 3
-MA_WINDOW_B = 7
-MA_WINDOW_C = 21
-SUFFIX_MA_A = '_MA_A'
-SUFFIX_MA_B = '_MA_B'
-SUFFIX_MA_C = '_MA_C'
-
-
-def group_add_ma_a(grouped, name: str):
-    return group_add_ma_n(grouped, name, SUFFIX_MA_A, MA_WINDOW_A)
-
-
-def group_add_ma_b(grouped, name: str):
-    return group_add_ma_n(grouped, name, SUFFIX_MA_B, MA_WINDOW_B)
-
-
-def group_add_ma_c(grouped, name: str):
-    return group_add_ma_n(grouped, name, SUFFIX_MA_C, MA_WINDOW_C)
-
-
-def group_add_ma_n(grouped, name: str, suffix: str, window: int):
-    name_ma = name + suffix
-    # shift by 1 so we look only at past days
-    # NOTE: the shift is also important so we don't include today's predicted data in the value
-    grouped[name_ma] = grouped[name].copy().shift(1).bfill().ffill()  # NOTE copy is needed?
-    grouped[name_ma] = grouped[name_ma].rolling(window=window, min_periods=1).mean().bfill().ffill()
-    return grouped
-
-
-def add_working_day_tomorrow(grouped):
-    grouped[WORKING_DAY + '_tomorrow'] = grouped[WORKING_DAY].copy().shift(-1).bfill().ffill()  # NOTE copy is needed?
-    return grouped
-
-
-def add_working_day_yesterday(grouped):
-    grouped[WORKING_DAY + '_yesterday'] = grouped[WORKING_DAY].copy().shift(1).bfill().ffill()  # NOTE copy is needed?
-    return grouped
@@ -0,0 +1,37 @@
+import json
+import unittest
+from datetime import date
+
+from pandora import loader
+from pandora.data import geo, country_code, population, working_day
+from pandora.profiler import Profiler
+
+MODULES = [country_code.module, population.module, working_day.module]
+
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def test_load_is_profiled(self):
+        finished = []
+        with Profiler(callback=finished.append) as profiler:
+            loader.load(date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 8), geo.module, MODULES)
+        stages = {record['stage'] for record in profiler.records}
+        self.assertTrue({'load', 'load_module', 'read', 'expand', 'merge', 'impute', 'impute_plan'} <= stages)
+        self.assertEqual(finished, profiler.records)
+        self.assertEqual(profiler.records[-1]['stage'], 'load')
+        self.assertEqual(profiler.records[-1]['rows_out'], 472)
+        for record in profiler.records:
+            self.assertGreaterEqual(record['seconds'], 0.0)
+            self.assertIn('peak_bytes', record)
+        levels = [level for record in profiler.records if record['stage'] == 'impute_plan'
+                  for level in record['levels']]
+        self.assertTrue(any(level['filled'] > 0 for level in levels))
+        report = json.loads(profiler.to_json())
+        self.assertEqual(len(report['records']), len(profiler.records))
+
+    def test_parallel_load_is_profiled(self):
+        with Profiler(trace_memory=False) as profiler:
+            loader.load(date(2020, 1, 10), date(2020, 1, 11), date(2020, 1, 1), date(2020, 1, 8), geo.module, MODULES,
+                        workers=2)
+        locations = {record['location'] for record in profiler.records if record['stage'] == 'load_module'}
+        self.assertEqual(locations, {module.location for module in [geo.module] + MODULES})
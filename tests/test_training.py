@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from sklearn.model_selection import GridSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from pandora.core_fields import GEO_CODE, DATE
+from pandora.training import to_matrix, ColumnSelector, build_pipeline, numeric, nominal
+
+
+class CountingScaler(StandardScaler):
+    fits = 0
+
+    def fit(self, x, y=None, sample_weight=None):
+        CountingScaler.fits += 1
+        return super().fit(x, y, sample_weight)
+
+
+def sample() -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    return pd.DataFrame({'label': rng.normal(size=200),
+                         GEO_CODE: pd.Categorical(rng.choice(['DE', 'IT', 'US/Texas'], 200)),
+                         DATE: np.repeat(pd.date_range('2020-03-01', periods=100), 2),
+                         'cases': pd.array(rng.integers(0, 100, 200), dtype='Int32'),
+                         'cases_missing': rng.random(200) < 0.1,
+                         'temperature': rng.normal(size=200).astype('float32')})
+
+
+class TrainingTestCase(unittest.TestCase):
+
+    def test_to_matrix(self):
+        df = sample()
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = to_matrix(df, os.path.join(directory, 'features.npy'))
+            self.assertIsInstance(matrix.values, np.memmap)
+            self.assertEqual(matrix.values.dtype, np.float32)
+            self.assertTrue(matrix.values.flags['F_CONTIGUOUS'])
+            self.assertEqual(matrix.values.shape, (200, 6))
+            self.assertEqual(matrix.indices(['cases', GEO_CODE]), [3, 1])
+            np.testing.assert_array_equal(matrix.values[:, matrix.index('cases')], df['cases'].astype('float32'))
+            np.testing.assert_array_equal(matrix.values[:, matrix.index('cases_missing')], df['cases_missing'])
+            geo_codes = matrix.values[:, matrix.index(GEO_CODE)].astype('int64')
+            self.assertEqual(list(matrix.categories[GEO_CODE].take(geo_codes)), list(df[GEO_CODE]))
+            self.assertEqual(matrix.values[0, matrix.index(DATE)], 18322.0)
+            self.assertIsInstance(matrix.rows(0, 150), np.memmap)
+
+    def test_grid_search_on_matrix(self):
+        df = sample()
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = to_matrix(df, os.path.join(directory, 'features.npy'))
+            pipeline = Pipeline([('select', ColumnSelector(matrix.indices(['cases', 'temperature']))),
+                                 ('scale', StandardScaler()),
+                                 ('estimator', SGDRegressor())])
+            grid = GridSearchCV(pipeline, {'estimator__alpha': [0.0001, 0.001]}, cv=2, n_jobs=2)
+            grid.fit(matrix.rows(), matrix.values[:, matrix.index('label')])
+            self.assertIn(grid.best_params_['estimator__alpha'], [0.0001, 0.001])
+
+    def test_cached_feature_transforms(self):
+        df = sample()
+        parameters = {'estimator__alpha': [0.0001, 0.001, 0.01]}
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = to_matrix(df, os.path.join(directory, 'features.npy'))
+            fits = []
+            scores = []
+            for memory in [None, os.path.join(directory, 'memory')]:
+                features = [nominal(matrix, GEO_CODE),
+                            numeric(matrix, 'temperature'),
+                            ('cases', Pipeline([('select', ColumnSelector([matrix.index('cases')])),
+                                                ('scale', CountingScaler())]))]
+                pipeline = build_pipeline(features, SGDRegressor(random_state=0), memory=memory)
+                CountingScaler.fits = 0
+                grid = GridSearchCV(pipeline, parameters, cv=2, refit=False)
+                grid.fit(matrix.rows(), matrix.values[:, matrix.index('label')])
+                fits.append(CountingScaler.fits)
+                scores.append(grid.cv_results_['mean_test_score'])
+        # the features are fit once per fold and candidate without a memory, and once per fold with it
+        self.assertEqual(fits, [6, 2])
+        np.testing.assert_allclose(scores[0], scores[1])
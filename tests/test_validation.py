@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pandora import loader
+from pandora.core_fields import GEO_CODE, DATE, DAY_OF_WEEK, QUARTER
+from pandora.validation import validate, NA, DTYPE, RANGE
+
+
+def sample() -> pd.DataFrame:
+    dates = pd.date_range('2020-01-01', periods=10)
+    return pd.DataFrame({GEO_CODE: pd.Categorical(['DE'] * 10),
+                         DATE: dates,
+                         DAY_OF_WEEK: (dates.dayofweek + 1).to_numpy(dtype='int8'),
+                         QUARTER: dates.quarter.to_numpy(dtype='int8'),
+                         'cases': np.arange(10, dtype='float32')})
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def test_valid(self):
+        report = validate(sample(), {GEO_CODE: 'category', 'cases': 'float32'})
+        self.assertTrue(report.valid)
+        self.assertFalse(report.sampled)
+        self.assertTrue(report.rows().empty)
+
+    def test_violations(self):
+        df = sample()
+        df.loc[[2, 5], 'cases'] = np.nan
+        df.loc[7, DAY_OF_WEEK] = 8
+        df[QUARTER] = df[QUARTER].astype('float64')
+        report = validate(df, {'cases': 'float32'})
+        self.assertFalse(report.valid)
+        self.assertEqual([(violation.column, violation.check) for violation in report.violations],
+                         [(DAY_OF_WEEK, RANGE), (QUARTER, DTYPE), ('cases', NA)])
+        rows = report.rows()
+        self.assertEqual(list(rows[DATE].dt.day), [8, 3, 6])
+        self.assertEqual(list(rows['check']), [RANGE, NA, NA])
+        with self.assertRaisesRegex(ValueError, 'cases has 2 NA values'):
+            loader.validate(df)
+
+    def test_sampled(self):
+        df = pd.concat([sample()] * 100, ignore_index=True)
+        df.loc[::2, 'cases'] = np.nan
+        report = validate(df, sample=100, random_state=5)
+        self.assertTrue(report.sampled)
+        self.assertEqual(report.rows_checked, 100)
+        positions = report.violations[0].positions
+        self.assertTrue(0 < len(positions) < 100)
+        self.assertTrue((positions % 2 == 0).all())
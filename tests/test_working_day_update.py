@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import pandas as pd
+from workalendar.registry import registry
+
+from pandora import partitions
+from pandora.data.working_day import WORKING_DAY
+from pandora.data.working_day_update import update, update_for_country_code
+
+
+class WorkingDayUpdateTestCase(unittest.TestCase):
+
+    def test_update_for_country_code(self):
+        dates = pd.date_range(date(2020, 12, 1), date(2021, 3, 31))
+        # taiwan declares extra working days on top of its holidays and weekends
+        for code in ['DE', 'US', 'TW']:
+            calendar = registry.get(code)()
+            df = update_for_country_code(code, dates)
+            self.assertEqual(list(df[WORKING_DAY]), [int(calendar.is_working_day(day.date())) for day in dates])
+
+    def test_update_is_incremental(self):
+        with tempfile.TemporaryDirectory() as location:
+            update(date(2021, 1, 1), date(2021, 1, 31), location, workers=2)
+            self.assertEqual([path.name for path in partitions.list_partitions(location)], ['2021-01.csv'])
+            modified = partitions.list_partitions(location)[0].stat().st_mtime_ns
+            update(date(2021, 1, 1), date(2021, 2, 10), location, workers=2)
+            paths = partitions.list_partitions(location)
+            self.assertEqual([path.name for path in paths], ['2021-01.csv', '2021-02.csv'])
+            self.assertEqual(paths[0].stat().st_mtime_ns, modified)
+            df = pd.read_csv(paths[1], keep_default_na=False)
+            self.assertEqual(df.groupby('country_code').size().unique().tolist(), [28])
+
+    def test_update_recomputes_months(self):
+        with tempfile.TemporaryDirectory() as location:
+            update(date(2021, 1, 1), date(2021, 2, 28), location, workers=2)
+            paths = partitions.list_partitions(location)
+            # a stale stored month, as after a holiday correction of the calendars
+            df = pd.read_csv(paths[1], keep_default_na=False)
+            df.assign(**{WORKING_DAY: 0}).to_csv(paths[1], index=False)
+            update(date(2021, 1, 1), date(2021, 2, 28), location, workers=2)
+            self.assertEqual(pd.read_csv(paths[1], keep_default_na=False)[WORKING_DAY].max(), 0)
+            modified = paths[0].stat().st_mtime_ns
+            update(date(2021, 1, 1), date(2021, 2, 28), location, workers=2, months=['2021-02'])
+            pd.testing.assert_frame_equal(pd.read_csv(paths[1], keep_default_na=False), df)
+            self.assertEqual(paths[0].stat().st_mtime_ns, modified)
+            update(date(2021, 1, 1), date(2021, 2, 28), location, workers=2, force=True)
+            self.assertEqual(sorted(os.listdir(location)), ['2021-01.csv', '2021-02.csv'])
+            pd.testing.assert_frame_equal(pd.read_csv(paths[1], keep_default_na=False), df)
+            self.assertNotEqual(paths[0].stat().st_mtime_ns, modified)